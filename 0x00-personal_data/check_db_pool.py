@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""Check ConnectionPool against a sqlite stand-in of the users db."""
+import os
+import tempfile
+import threading
+import time
+from contextlib import closing
+from db_pool import ConnectionPool, sqlite_connector
+
+
+def check_waits_for_release(database: str):
+    """acquire() blocks until another thread gives its connection back."""
+    pool = ConnectionPool(sqlite_connector(database), size=1)
+    held = pool.acquire()
+    threading.Timer(0.5, pool.release, (held,)).start()
+    start = time.monotonic()
+    connection = pool.acquire()
+    waited = time.monotonic() - start
+    assert connection is held, "idle connection not reused"
+    assert waited >= 0.4, "acquire returned after {:.3f}s".format(waited)
+    pool.release(connection)
+    pool.close()
+
+
+def check_timeout(database: str):
+    """acquire(timeout) gives up once the pool stays full."""
+    pool = ConnectionPool(sqlite_connector(database), size=1)
+    held = pool.acquire()
+    start = time.monotonic()
+    try:
+        pool.acquire(timeout=0.2)
+    except TimeoutError:
+        assert time.monotonic() - start >= 0.15
+    else:
+        raise AssertionError("acquire(timeout=0.2) did not time out")
+    pool.release(held)
+    pool.close()
+
+
+def check_threads(database: str, threads: int = 8, size: int = 2):
+    """Never more than size connections out, every query sees the rows."""
+    pool = ConnectionPool(sqlite_connector(database), size=size)
+    out = []
+    peak = []
+    lock = threading.Lock()
+
+    def work():
+        for _ in range(20):
+            with pool.connection() as connection:
+                with lock:
+                    out.append(connection)
+                    peak.append(len(out))
+                with closing(connection.cursor()) as cursor:
+                    cursor.execute("SELECT COUNT(*) FROM users")
+                    assert cursor.fetchone()[0] == 3
+                with lock:
+                    out.remove(connection)
+
+    workers = [threading.Thread(target=work) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert max(peak) <= size, "{} connections out".format(max(peak))
+    pool.close()
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as directory:
+        database = os.path.join(directory, "users.sqlite3")
+        with closing(sqlite_connector(database)()) as connection:
+            connection.execute("CREATE TABLE users (name TEXT, email TEXT)")
+            connection.executemany("INSERT INTO users VALUES (?, ?)",
+                                   [("a", "a@b"), ("b", "b@c"),
+                                    ("c", "c@d")])
+            connection.commit()
+        check_waits_for_release(database)
+        check_timeout(database)
+        check_threads(database)
+    print("ok")
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""Connection pool for DB-API connections."""
+
+
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import closing, contextmanager
+from functools import partial
+from typing import Any, Callable
+
+
+def ping(connection) -> bool:
+    """Health check that works for mysql.connector and sqlite3."""
+    try:
+        with closing(connection.cursor()) as cursor:
+            cursor.execute("SELECT 1")
+            cursor.fetchall()
+        return True
+    except Exception:
+        return False
+
+
+def sqlite_connector(database: str) -> Callable[[], Any]:
+    """Connection factory for a local sqlite stand-in of the users db."""
+    return partial(sqlite3.connect, database, check_same_thread=False)
+
+
+class ConnectionPool:
+    """Hands out at most `size` connections made by `connect`.
+
+    Idle connections are reused most recently used first, checked with
+    `health_check` before being handed out and closed once they have been
+    idle for more than `idle_timeout` seconds.
+    """
+
+    def __init__(self, connect: Callable[[], Any], size: int = 5,
+                 idle_timeout: float = 300.0,
+                 health_check: Callable[[Any], bool] = ping):
+        """Init pool, no connection is opened until needed."""
+        if size < 1:
+            raise ValueError("pool size must be at least 1")
+        self.connect = connect
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.health_check = health_check
+        self._idle = deque()
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(size)
+        self._closed = False
+
+    def _close(self, connection) -> None:
+        """Close a connection, ignoring errors from dead ones."""
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def evict_idle(self) -> int:
+        """Close connections idle for longer than idle_timeout."""
+        limit = time.monotonic() - self.idle_timeout
+        stale = []
+        with self._lock:
+            while self._idle and self._idle[0][1] < limit:
+                stale.append(self._idle.popleft()[0])
+        for connection in stale:
+            self._close(connection)
+        return len(stale)
+
+    def acquire(self, timeout: float = None):
+        """Take a healthy connection, waiting for a free slot if needed.
+
+        Waits at most timeout seconds (forever when None), then raises
+        TimeoutError.
+        """
+        if self._closed:
+            raise RuntimeError("pool is closed")
+        if not self._slots.acquire(timeout=timeout):
+            raise TimeoutError("no connection available")
+        try:
+            self.evict_idle()
+            while True:
+                with self._lock:
+                    if not self._idle:
+                        break
+                    connection = self._idle.pop()[0]
+                if self.health_check(connection):
+                    return connection
+                self._close(connection)
+            return self.connect()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, connection) -> None:
+        """Give a connection back to the pool."""
+        try:
+            if self._closed:
+                self._close(connection)
+                return
+            with self._lock:
+                self._idle.append((connection, time.monotonic()))
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self, timeout: float = None):
+        """Borrow a connection for the duration of a with block."""
+        connection = self.acquire(timeout)
+        try:
+            yield connection
+        finally:
+            self.release(connection)
+
+    def close(self) -> None:
+        """Close every idle connection and refuse new checkouts."""
+        self._closed = True
+        with self._lock:
+            idle, self._idle = self._idle, deque()
+        for connection, _ in idle:
+            self._close(connection)
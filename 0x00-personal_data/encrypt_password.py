@@ -2,14 +2,126 @@
 """Encrypting Passwords."""
 
 
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Optional, Tuple
+
 import bcrypt
 
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Shared bcrypt thread pool, bcrypt releases the GIL while hashing."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=int(os.getenv("BCRYPT_WORKERS",
+                                              os.cpu_count() or 1)),
+                    thread_name_prefix="bcrypt",
+                )
+    return _executor
+
+
+def calibrate_rounds(budget_ms: float = 250.0, min_rounds: int = 4,
+                     max_rounds: int = 16, apply: bool = True) -> int:
+    """Highest bcrypt cost whose hash takes at most budget_ms here.
+
+    Costs are timed upwards from min_rounds and the search stops at the
+    first one over budget (each round doubles the work). Sets
+    BCRYPT_ROUNDS unless apply is False; never goes below min_rounds.
+    """
+    global BCRYPT_ROUNDS
+    rounds = min_rounds
+    while rounds < max_rounds:
+        start = time.perf_counter()
+        bcrypt.hashpw(b"calibration", bcrypt.gensalt(rounds + 1))
+        if (time.perf_counter() - start) * 1000 > budget_ms:
+            break
+        rounds += 1
+    if apply:
+        BCRYPT_ROUNDS = rounds
+    return rounds
+
+
+def hash_rounds(hashed_password: bytes) -> int:
+    """Cost factor a bcrypt hash was made with ($2b$<rounds>$...)."""
+    return int(hashed_password.split(b'$')[2])
+
+
+def needs_rehash(hashed_password: bytes) -> bool:
+    """True when hashed_password uses a lower cost than BCRYPT_ROUNDS."""
+    return hash_rounds(hashed_password) < BCRYPT_ROUNDS
+
 
 def hash_password(password: str) -> bytes:
     """Encrypting Passwords."""
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+    return bcrypt.hashpw(password.encode('utf-8'),
+                         bcrypt.gensalt(BCRYPT_ROUNDS))
 
 
 def is_valid(hashed_password: bytes, password: str) -> bool:
     """Isit valid?."""
     return bcrypt.checkpw(password.encode('utf-8'), hashed_password)
+
+
+def verify_and_update(hashed_password: bytes, password: str) \
+        -> Tuple[bool, Optional[bytes]]:
+    """is_valid plus an upgraded hash to store when the cost is outdated.
+
+    Returns (valid, new_hash), new_hash is None unless the password is
+    valid and needs_rehash(hashed_password).
+    """
+    if not is_valid(hashed_password, password):
+        return False, None
+    if needs_rehash(hashed_password):
+        return True, hash_password(password)
+    return True, None
+
+
+def _is_valid_pair(pair: Tuple[bytes, str]) -> bool:
+    """is_valid for a (hashed_password, password) pair."""
+    return is_valid(*pair)
+
+
+def hash_passwords(passwords: Iterable[str]) -> List[bytes]:
+    """Hash many passwords in parallel, results keep the input order."""
+    return list(get_executor().map(hash_password, passwords))
+
+
+def verify_many(pairs: Iterable[Tuple[bytes, str]]) -> List[bool]:
+    """is_valid for many (hashed_password, password) pairs in parallel."""
+    return list(get_executor().map(_is_valid_pair, pairs))
+
+
+async def hash_password_async(password: str) -> bytes:
+    """hash_password without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), hash_password, password)
+
+
+async def is_valid_async(hashed_password: bytes, password: str) -> bool:
+    """is_valid without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), is_valid,
+                                      hashed_password, password)
+
+
+async def hash_passwords_async(passwords: Iterable[str]) -> List[bytes]:
+    """hash_passwords without blocking the event loop."""
+    return list(await asyncio.gather(
+        *(hash_password_async(p) for p in passwords)))
+
+
+async def verify_many_async(pairs: Iterable[Tuple[bytes, str]]) \
+        -> List[bool]:
+    """verify_many without blocking the event loop."""
+    return list(await asyncio.gather(
+        *(is_valid_async(h, p) for h, p in pairs)))
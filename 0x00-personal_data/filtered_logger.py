@@ -4,19 +4,100 @@
 
 import re
 import os
+import atexit
+import queue
+import sys
 import logging
-from typing import List
+import multiprocessing
+import sqlite3
+import threading
+from contextlib import closing
+from functools import lru_cache
+from typing import Callable, List, Sequence, TextIO, Tuple
 import mysql.connector
+from db_pool import ConnectionPool
+from log_queue import BatchingListener, RawQueueHandler
 
 PII_FIELDS = ("name", "email", "phone", "ssn", "password")
+REDACTOR_CACHE_SIZE = 128
+USER_COLUMNS = "name,email,phone,ssn,password,ip,last_login,user_agent"
+EXPORT_BATCH_SIZE = 1000
+EXPORT_PROGRESS_EVERY = 100000
+EXPORT_RANGE_SIZE = 10000
+
+
+class Redactor:
+    """Compiled redaction pattern for one (fields, separator) pair."""
+
+    def __init__(self, fields: Sequence[str], separator: str):
+        """Compile the pattern once."""
+        self.fields = tuple(fields)
+        self.separator = separator
+        self.pattern = re.compile(
+            f"({'|'.join(self.fields)})=[^{separator}]*")
+
+    def sub(self, redaction: str, message: str) -> str:
+        """Redact every field value in message."""
+        repl = r'\1=' + redaction.replace('\\', r'\\')
+        return self.pattern.sub(repl, message)
+
+
+class TokenRedactor:
+    """Regex free redactor: split on separator and look up each key.
+
+    Same output as Redactor: in each part, the first `=` preceded by
+    a field (even inside a word, as the regex does not anchor it) has
+    everything after it up to the separator replaced, e.g.
+    `action=login password=...` or `; email=...`. Only single character
+    separators and a non empty set of fields without regex
+    metacharacters are accepted, for which both backends agree.
+    """
+
+    def __init__(self, fields: Sequence[str], separator: str):
+        """Build the field lookup set."""
+        if len(separator) != 1:
+            raise ValueError("token redactor needs a 1 character separator")
+        if not fields:
+            raise ValueError("token redactor needs at least one field")
+        for field in fields:
+            if not field or re.escape(field) != field or '=' in field:
+                raise ValueError(
+                    "token redactor can't match field {!r}".format(field))
+        self.fields = tuple(fields)
+        self.separator = separator
+
+    def sub(self, redaction: str, message: str) -> str:
+        """Redact every field value in message."""
+        fields = self.fields
+        parts = message.split(self.separator)
+        for i, part in enumerate(parts):
+            eq = part.find('=')
+            while eq >= 0:
+                if part.endswith(fields, 0, eq):
+                    parts[i] = part[:eq + 1] + redaction
+                    break
+                eq = part.find('=', eq + 1)
+        return self.separator.join(parts)
+
+
+REDACTORS = {
+    "regex": Redactor,
+    "token": TokenRedactor,
+}
+
+
+@lru_cache(maxsize=REDACTOR_CACHE_SIZE)
+def get_redactor(fields: Sequence[str], separator: str,
+                 backend: str = "regex"):
+    """Cached redactor, fields must be hashable (tuple)."""
+    return REDACTORS[backend](fields, separator)
 
 
 def filter_datum(fields: List[str], redaction: str,
                  message: str, separator: str,
                  ) -> str:
     """Dataa obfuscator."""
-    p = f"({'|'.join(fields)})=[^{separator}]*"
-    return re.sub(p, lambda x: f'{x.group(1)}={redaction}', message)
+    return get_redactor(tuple(fields), separator).sub(redaction, message)
 
 
 class RedactingFormatter(logging.Formatter):
@@ -26,25 +107,40 @@ class RedactingFormatter(logging.Formatter):
     FORMAT = "[HOLBERTON] %(name)s %(levelname)s %(asctime)-15s: %(message)s"
     SEPARATOR = ";"
 
-    def __init__(self, fields: List[str]):
-        """Init class."""
+    def __init__(self, fields: List[str], backend: str = "regex"):
+        """Init class, backend is one of REDACTORS."""
         self.fields = fields
+        self.redactor = get_redactor(tuple(fields), self.SEPARATOR, backend)
         super(RedactingFormatter, self).__init__(self.FORMAT)
 
     def format(self, record: logging.LogRecord) -> str:
         """Format records."""
         msg = super(RedactingFormatter, self).format(record)
-        return filter_datum(self.fields, self.REDACTION, msg, self.SEPARATOR)
+        return self.redactor.sub(self.REDACTION, msg)
+
 
+def get_logger(non_blocking: bool = False, queue_size: int = 10000,
+               block: bool = False) -> logging.Logger:
+    """Logger for user data.
 
-def get_logger() -> logging.Logger:
-    """Logger for user data."""
+    With non_blocking=True callers only enqueue records (at most
+    queue_size, dropped when full unless block=True) and a listener
+    thread redacts and writes them in batches; queued records are
+    flushed at interpreter exit.
+    """
     logger = logging.getLogger("user_data")
     stream_handler = logging.StreamHandler()
     stream_handler.setFormatter(RedactingFormatter(PII_FIELDS))
     logger.setLevel(logging.INFO)
     logger.propagate = False
-    logger.addHandler(stream_handler)
+    if non_blocking:
+        q = queue.Queue(queue_size)
+        listener = BatchingListener(q, stream_handler)
+        listener.start()
+        atexit.register(listener.stop)
+        logger.addHandler(RawQueueHandler(q, block=block))
+    else:
+        logger.addHandler(stream_handler)
     return logger
 
 
@@ -64,25 +160,214 @@ def get_db() -> mysql.connector.connection.MySQLConnection:
     return c
 
 
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """Shared pool of get_db() connections.
+
+    Sized by PERSONAL_DATA_DB_POOL_SIZE, idle connections are closed after
+    PERSONAL_DATA_DB_POOL_IDLE seconds.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    get_db,
+                    size=int(os.getenv("PERSONAL_DATA_DB_POOL_SIZE", 5)),
+                    idle_timeout=float(
+                        os.getenv("PERSONAL_DATA_DB_POOL_IDLE", 300)),
+                )
+    return _pool
+
+
+def format_row(columns: Sequence[str], row: Sequence) -> str:
+    """One users row as a `key=value;` log message."""
+    record = map(
+        lambda x: '{}={}'.format(x[0], x[1]),
+        zip(columns, row),
+    )
+    return '{};'.format('; '.join(list(record)))
+
+
+def export_users(connection, logger: logging.Logger,
+                 batch_size: int = EXPORT_BATCH_SIZE,
+                 progress: Callable[[int], None] = None,
+                 progress_every: int = EXPORT_PROGRESS_EVERY) -> int:
+    """Stream the users table to logger, batch_size rows at a time.
+
+    Works with any DB-API connection (mysql.connector, sqlite3, ...),
+    memory is bounded by one batch. progress(n) is called every
+    progress_every rows and once at the end, returns the row count.
+    """
+    columns = USER_COLUMNS.split(',')
+    query = "SELECT {} FROM users;".format(USER_COLUMNS)
+    count = 0
+    with closing(connection.cursor()) as cursor:
+        cursor.execute(query)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                msg = format_row(columns, row)
+                args = ("user_data", logging.INFO, None, None, msg, None, None)
+                log_record = logging.LogRecord(*args)
+                logger.handle(log_record)
+                count += 1
+                if progress and count % progress_every == 0:
+                    progress(count)
+    if progress:
+        progress(count)
+    return count
+
+
+def _placeholder(connection) -> str:
+    """DB-API parameter marker for connection (sqlite3 or mysql)."""
+    return '?' if isinstance(connection, sqlite3.Connection) else '%s'
+
+
+def _partition_key(connection) -> str:
+    """Unique, non null column to split users on: rowid for sqlite, the
+    single column primary key otherwise (None when there is none)."""
+    if isinstance(connection, sqlite3.Connection):
+        return "rowid"
+    with closing(connection.cursor()) as cursor:
+        cursor.execute("SHOW KEYS FROM users WHERE Key_name = 'PRIMARY';")
+        keys = cursor.fetchall()
+    return keys[0][4] if len(keys) == 1 else None
+
+
+def _key_bounds(connection, key: str, range_size: int) -> List:
+    """Every range_size-th non null value of key, in order, without
+    repeats: the range starts."""
+    bounds = []
+    i = 0
+    with closing(connection.cursor()) as cursor:
+        cursor.execute("SELECT {0} FROM users WHERE {0} IS NOT NULL "
+                       "ORDER BY {0};".format(key))
+        while True:
+            rows = cursor.fetchmany(EXPORT_BATCH_SIZE)
+            if not rows:
+                break
+            for row in rows:
+                if i % range_size == 0 and \
+                        (not bounds or bounds[-1] != row[0]):
+                    bounds.append(row[0])
+                i += 1
+    return bounds
+
+
+def _count_users(connection) -> int:
+    """SELECT COUNT(*) FROM users."""
+    with closing(connection.cursor()) as cursor:
+        cursor.execute("SELECT COUNT(*) FROM users;")
+        return cursor.fetchone()[0]
+
+
+def _export_range(job: Tuple[Callable, str, object, object]) -> List[str]:
+    """Worker: fetch and redact the rows with low <= key < high, or the
+    rows whose key is NULL when low and high are both None."""
+    connect, key, low, high = job
+    columns = USER_COLUMNS.split(',')
+    formatter = RedactingFormatter(PII_FIELDS)
+    lines = []
+    with closing(connect()) as connection:
+        mark = _placeholder(connection)
+        query = "SELECT {} FROM users WHERE ".format(USER_COLUMNS)
+        if low is None and high is None:
+            query += "{} IS NULL".format(key)
+            params = ()
+        else:
+            query += "{} >= {}".format(key, mark)
+            params = (low,)
+            if high is not None:
+                query += " AND {} < {}".format(key, mark)
+                params = (low, high)
+            query += " ORDER BY {}".format(key)
+        with closing(connection.cursor()) as cursor:
+            cursor.execute(query + ";", params)
+            for row in cursor:
+                args = ("user_data", logging.INFO, None, None,
+                        format_row(columns, row), None, None)
+                lines.append(formatter.format(logging.LogRecord(*args)))
+    return lines
+
+
+def export_users_parallel(connect: Callable, stream: TextIO = None,
+                          workers: int = None,
+                          range_size: int = EXPORT_RANGE_SIZE,
+                          key: str = None, ordered: bool = True,
+                          progress: Callable[[int], None] = None,
+                          progress_every: int = EXPORT_PROGRESS_EVERY) \
+        -> int:
+    """Export the users table with a pool of worker processes.
+
+    The table is split into ranges of about range_size rows of key
+    (default: rowid on sqlite, the primary key otherwise; rows whose
+    key is NULL form one extra range), each range is fetched and
+    redacted by a worker that opens its own connection with `connect`
+    (must be picklable, e.g. get_db), and this process writes the
+    redacted lines to stream (stderr by default, like get_logger).
+    With ordered=True output follows key order, which for rowid or a
+    clustered primary key is the table's own row order; with
+    ordered=False ranges are written as soon as they are ready.
+    progress works as in export_users. Returns the row count, and
+    raises RuntimeError when it differs from COUNT(*) taken before the
+    export (the table was written to meanwhile).
+    """
+    stream = stream or sys.stderr
+    with closing(connect()) as connection:
+        key = key or _partition_key(connection)
+        if key is None:
+            raise ValueError("users has no single column primary key, "
+                             "pass key=")
+        expected = _count_users(connection)
+        bounds = _key_bounds(connection, key, range_size)
+    jobs = [(connect, key, None, None)]
+    jobs += [(connect, key, low, high)
+             for low, high in zip(bounds, bounds[1:] + [None])]
+    count = 0
+    reported = 0
+    with multiprocessing.Pool(workers) as pool:
+        imap = pool.imap if ordered else pool.imap_unordered
+        for lines in imap(_export_range, jobs):
+            if lines:
+                stream.write('\n'.join(lines) + '\n')
+                count += len(lines)
+            if progress and count - reported >= progress_every:
+                reported = count - count % progress_every
+                progress(count)
+    stream.flush()
+    if progress:
+        progress(count)
+    if count != expected:
+        raise RuntimeError("exported {} users rows out of {}".format(
+            count, expected))
+    return count
+
+
+def report_progress(count: int):
+    """Export progress on stderr."""
+    sys.stderr.write("users exported: {}\n".format(count))
+    sys.stderr.flush()
+
+
 def main():
     """User data records in a table."""
-    f = "name,email,phone,ssn,password,ip,last_login,user_agent"
-    columns = f.split(',')
-    query = "SELECT {} FROM users;".format(f)
+    workers = int(os.getenv("PERSONAL_DATA_EXPORT_WORKERS", 1))
+    if workers > 1:
+        export_users_parallel(get_db, workers=workers,
+                              progress=report_progress)
+        return
     info_logger = get_logger()
-    connection = get_db()
-    with connection.cursor() as cursor:
-        cursor.execute(query)
-        rows = cursor.fetchall()
-        for row in rows:
-            record = map(
-                lambda x: '{}={}'.format(x[0], x[1]),
-                zip(columns, row),
-            )
-            msg = '{};'.format('; '.join(list(record)))
-            args = ("user_data", logging.INFO, None, None, msg, None, None)
-            log_record = logging.LogRecord(*args)
-            info_logger.handle(log_record)
+    batch_size = int(os.getenv("PERSONAL_DATA_BATCH_SIZE",
+                               EXPORT_BATCH_SIZE))
+    with get_pool().connection() as connection:
+        export_users(connection, info_logger, batch_size,
+                     progress=report_progress)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""Queue backed logging: format and write off the caller's thread."""
+
+
+import copy
+import logging
+import logging.handlers
+import queue
+import threading
+from typing import List
+
+
+class RawQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves formatting (redaction) to the listener.
+
+    When the queue is full the record is dropped (block=False, the
+    default) or the caller waits up to timeout seconds (block=True).
+    """
+
+    def __init__(self, q: queue.Queue, block: bool = False,
+                 timeout: float = None):
+        """Init handler."""
+        super().__init__(q)
+        self.block = block
+        self.timeout = timeout
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Merge args into msg but do not format the record."""
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        """Put record on the queue according to the full queue policy."""
+        try:
+            self.queue.put(record, self.block, self.timeout)
+        except queue.Full:
+            self.dropped += 1
+
+
+class BatchingListener:
+    """Thread draining a queue into a StreamHandler, batch_size at a time.
+
+    Each batch is formatted by the handler's formatter and written with a
+    single write and flush.
+    """
+
+    _sentinel = None
+
+    def __init__(self, q: queue.Queue, handler: logging.StreamHandler,
+                 batch_size: int = 256):
+        """Init listener, call start() to run it."""
+        self.queue = q
+        self.handler = handler
+        self.batch_size = batch_size
+        self._thread = None
+
+    def start(self) -> None:
+        """Start the writer thread."""
+        self._thread = threading.Thread(target=self._run, daemon=True,
+                                        name="redacted-log-writer")
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Write everything already queued then stop the thread."""
+        if self._thread is None:
+            return
+        self.queue.put(self._sentinel)
+        self._thread.join()
+        self._thread = None
+
+    def _write(self, batch: List[logging.LogRecord]) -> None:
+        """Format and write one batch."""
+        handler = self.handler
+        lines = []
+        for record in batch:
+            try:
+                lines.append(handler.format(record) + handler.terminator)
+            except Exception:
+                handler.handleError(record)
+        handler.acquire()
+        try:
+            handler.stream.write(''.join(lines))
+            handler.flush()
+        except Exception:
+            handler.handleError(batch[-1])
+        finally:
+            handler.release()
+
+    def _run(self) -> None:
+        """Drain the queue until the sentinel shows up."""
+        q = self.queue
+        running = True
+        while running:
+            batch = []
+            record = q.get()
+            while True:
+                if record is self._sentinel:
+                    running = False
+                    break
+                batch.append(record)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    record = q.get_nowait()
+                except queue.Empty:
+                    break
+            if batch:
+                self._write(batch)
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""Redact PII columns of a CSV dump (e.g. user_data.csv) in bulk."""
+
+
+import argparse
+import csv
+import sys
+from itertools import islice
+from typing import Iterable, List, Sequence, TextIO
+
+from filtered_logger import PII_FIELDS, RedactingFormatter
+
+CHUNK_ROWS = 10000
+
+
+def redact_chunk(rows: List[List[str]], pii: Sequence[bool],
+                 redaction: str) -> List[tuple]:
+    """Redact a chunk column by column.
+
+    The chunk is transposed, PII columns are swapped for one constant
+    column and the rest are passed through untouched.
+    """
+    if not rows:
+        return []
+    redacted = (redaction,) * len(rows)
+    columns = zip(*rows)
+    return list(zip(*[redacted if is_pii else column
+                      for column, is_pii in zip(columns, pii)]))
+
+
+def redact_csv(src: TextIO, dst: TextIO,
+               fields: Iterable[str] = PII_FIELDS,
+               redaction: str = RedactingFormatter.REDACTION,
+               chunk_rows: int = CHUNK_ROWS) -> int:
+    """Copy the CSV src to dst with the `fields` columns redacted.
+
+    Reads chunk_rows rows at a time so memory stays bounded, returns the
+    number of data rows written.
+    """
+    reader = csv.reader(src)
+    writer = csv.writer(dst, quoting=csv.QUOTE_ALL, lineterminator='\n')
+    header = next(reader, None)
+    if header is None:
+        return 0
+    fields = frozenset(fields)
+    pii = [name in fields for name in header]
+    writer.writerow(header)
+    count = 0
+    while True:
+        rows = list(islice(reader, chunk_rows))
+        if not rows:
+            break
+        width = len(header)
+        if any(len(row) != width for row in rows):
+            raise ValueError("row width does not match the header")
+        writer.writerows(redact_chunk(rows, pii, redaction))
+        count += len(rows)
+    return count
+
+
+def main(argv: List[str] = None) -> None:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("src", help="CSV file to redact, - for stdin")
+    parser.add_argument("dst", nargs="?", default="-",
+                        help="output file, - for stdout (default)")
+    parser.add_argument("--fields", default=','.join(PII_FIELDS),
+                        help="comma separated columns to redact")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    args = parser.parse_args(argv)
+    src = sys.stdin if args.src == "-" else open(args.src, newline='')
+    dst = sys.stdout if args.dst == "-" else open(args.dst, 'w', newline='')
+    try:
+        redact_csv(src, dst, args.fields.split(','),
+                   chunk_rows=args.chunk_rows)
+    finally:
+        if src is not sys.stdin:
+            src.close()
+        if dst is not sys.stdout:
+            dst.close()
+
+
+if __name__ == '__main__':
+    main()
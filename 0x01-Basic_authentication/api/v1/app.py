@@ -2,10 +2,11 @@
 """Route module for the API."""
 from os import getenv
 from api.v1.views import app_views
-from api.v1.auth.auth import Auth
+from api.v1.auth.auth import Auth, ExcludedPaths
 from api.v1.auth.basic_auth import BasicAuth
 from flask import Flask, jsonify, abort, request
 from flask_cors import (CORS, cross_origin)
+from models.hashers import Overloaded
 import os
 
 
@@ -18,6 +19,11 @@ if authT == "auth":
     auth = Auth()
 else:
     auth = BasicAuth()
+excluded_paths = ExcludedPaths([
+    '/api/v1/status/',
+    '/api/v1/unauthorized/',
+    '/api/v1/forbidden/',
+])
 
 
 @app.errorhandler(401)
@@ -38,21 +44,21 @@ def not_found(error) -> str:
     return jsonify({"error": "Not found"}), 404
 
 
+@app.errorhandler(Overloaded)
+def overloaded(error) -> str:
+    """Password verification queue full handler."""
+    return jsonify({"error": "Service Unavailable"}), 503, \
+        {"Retry-After": "1"}
+
+
 @app.before_request
 def authenticate_user():
     """Authenticate a user before processing a request."""
     if auth:
-        null = [
-            '/api/v1/status/',
-            '/api/v1/unauthorized/',
-            '/api/v1/forbidden/',
-        ]
-        if auth.require_auth(request.path, null):
-            auth_header = auth.authorization_header(request)
-            user = auth.current_user(request)
-            if auth_header is None:
+        if auth.require_auth(request.path, excluded_paths):
+            if auth.authorization_header(request) is None:
                 abort(401)
-            if user is None:
+            if auth.resolve_user(request) is None:
                 abort(403)
 
 
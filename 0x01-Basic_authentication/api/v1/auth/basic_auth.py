@@ -8,8 +8,89 @@ the authorization header, and retrieving user credentials.
 
 from .auth import Auth
 from models.user import User
+from collections import OrderedDict
 from typing import TypeVar, Tuple
 import base64
+import hashlib
+import hmac
+import os
+import threading
+import time
+
+
+class CredentialCache():
+    """
+    Bounded, TTL-based cache of verified Basic Authorization headers.
+
+    Entries are keyed by an HMAC of the raw header (with a key drawn at
+    startup, so no credential is kept in memory) and hold the user ID
+    with the email and password hash that were verified. A hit is only
+    served when the stored user still has that email and password hash,
+    so a password change or a removal invalidates it.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300):
+        """
+        Initialize an empty cache of at most maxsize entries, each valid
+        for ttl seconds. maxsize <= 0 disables the cache.
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._secret = os.urandom(32)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _key(self, authorization_header: str) -> bytes:
+        """
+        Keyed hash of authorization_header.
+        """
+        return hmac.new(self._secret, authorization_header.encode(),
+                        hashlib.sha256).digest()
+
+    def get(self, authorization_header: str) -> TypeVar('User'):
+        """
+        User verified for authorization_header, or None on a miss.
+        """
+        if self.maxsize <= 0 or type(authorization_header) != str:
+            return None
+        key = self._key(authorization_header)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[3] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        user = User.get(entry[0])
+        if user is None or user.email != entry[1] or \
+                user.password != entry[2]:
+            with self._lock:
+                self._entries.pop(key, None)
+            return None
+        return user
+
+    def put(self, authorization_header: str, user: TypeVar('User')):
+        """
+        Remember that authorization_header identifies user.
+        """
+        if self.maxsize <= 0:
+            return
+        key = self._key(authorization_header)
+        entry = (user.id, user.email, user.password,
+                 time.monotonic() + self.ttl)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """
+        Drop every entry.
+        """
+        with self._lock:
+            self._entries.clear()
 
 
 class BasicAuth(Auth):
@@ -35,8 +116,18 @@ class BasicAuth(Auth):
 
     current_user(request=None) -> TypeVar('User')
         Retrieves the current user from the request using basic authentication.
+
+    Attributes
+    ----------
+    credentials : CredentialCache
+        Verified Authorization headers, shared by every instance; sized
+        by BASIC_AUTH_CACHE_SIZE and BASIC_AUTH_CACHE_TTL (seconds).
     """
 
+    credentials = CredentialCache(
+        int(os.getenv("BASIC_AUTH_CACHE_SIZE", 1024)),
+        float(os.getenv("BASIC_AUTH_CACHE_TTL", 300)))
+
     def extract_base64_authorization_header(self, authorization_header: str) \
             -> str:
         """
@@ -164,7 +255,13 @@ class BasicAuth(Auth):
             or None if authentication fails.
         """
         auth_header = self.authorization_header(request)
+        user = self.credentials.get(auth_header)
+        if user is not None:
+            return user
         b64_auth_token = self.extract_base64_authorization_header(auth_header)
         auth_token = self.decode_base64_authorization_header(b64_auth_token)
         email, password = self.extract_user_credentials(auth_token)
-        return self.user_object_from_credentials(email, password)
+        user = self.user_object_from_credentials(email, password)
+        if user is not None:
+            self.credentials.put(auth_header, user)
+        return user
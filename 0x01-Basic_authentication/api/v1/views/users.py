@@ -2,18 +2,77 @@
 """ Module of Users views
 """
 from api.v1.views import app_views
-from flask import abort, jsonify, request
+from flask import Response, abort, jsonify, request, stream_with_context
 from models.user import User
+import json
+
+MAX_LIMIT = 1000
+
+
+def user_fields(user, fields: list = None) -> dict:
+    """ JSON representation of user, limited to fields when given
+    """
+    data = user.to_json()
+    if fields is None:
+        return data
+    return {k: data[k] for k in fields if k in data}
 
 
 @app_views.route('/users', methods=['GET'], strict_slashes=False)
 def view_all_users() -> str:
     """ GET /api/v1/users
+    Query parameters (optional):
+      - limit: page size (at most MAX_LIMIT), users are then sorted
+        by ID
+      - cursor: ID of the last user of the previous page
+      - fields: comma separated attributes to return
+      - stream: 1 to send the list incrementally, in ID order, users
+        being loaded as they are sent
     Return:
       - list of all User objects JSON represented
+      - X-Next-Cursor header when a next page exists
+      - 400 if limit isn't a positive integer
     """
-    all_users = [user.to_json() for user in User.all()]
-    return jsonify(all_users)
+    limit = request.args.get('limit')
+    cursor = request.args.get('cursor') or None
+    fields = request.args.get('fields')
+    stream = request.args.get('stream') in ('1', 'true')
+    if fields is not None:
+        fields = [field for field in fields.split(',') if field]
+    next_cursor = None
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            limit = 0
+        if limit <= 0:
+            return jsonify({'error': "limit must be a positive integer"}), 400
+        limit = min(limit, MAX_LIMIT)
+        users = list(User.page(cursor, limit + 1))
+        if len(users) > limit:
+            users = users[:limit]
+            next_cursor = users[-1].id
+    elif cursor is not None or stream:
+        users = User.page(cursor)
+    else:
+        users = User.all()
+    if stream:
+        def generate():
+            """ JSON array, one user per chunk
+            """
+            sep = "["
+            for user in users:
+                yield sep + json.dumps(user_fields(user, fields),
+                                       sort_keys=True)
+                sep = ","
+            yield "[]\n" if sep == "[" else "]\n"
+        response = Response(stream_with_context(generate()),
+                            mimetype='application/json')
+    else:
+        response = jsonify([user_fields(user, fields) for user in users])
+    if next_cursor is not None:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
 
 
 @app_views.route('/users/<user_id>', methods=['GET'], strict_slashes=False)
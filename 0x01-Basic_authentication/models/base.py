@@ -1,8 +1,9 @@
 #!/usr/bin/env python3
 """ Base module
 """
+from bisect import bisect_left, bisect_right, insort
 from datetime import datetime
-from typing import TypeVar, List, Iterable
+from typing import TypeVar, List, Iterable, Iterator
 from os import path
 import json
 import uuid
@@ -10,6 +11,8 @@ import uuid
 
 TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
 DATA = {}
+ORDER = {}
+PAGE_CHUNK = 1000
 
 
 class Base():
@@ -64,6 +67,7 @@ class Base():
         s_class = cls.__name__
         file_path = ".db_{}.json".format(s_class)
         DATA[s_class] = {}
+        ORDER.pop(s_class, None)
         if not path.exists(file_path):
             return
 
@@ -90,6 +94,8 @@ class Base():
         """
         s_class = self.__class__.__name__
         self.updated_at = datetime.utcnow()
+        if s_class in ORDER and self.id not in DATA[s_class]:
+            insort(ORDER[s_class], self.id)
         DATA[s_class][self.id] = self
         self.__class__.save_to_file()
 
@@ -99,6 +105,9 @@ class Base():
         s_class = self.__class__.__name__
         if DATA[s_class].get(self.id) is not None:
             del DATA[s_class][self.id]
+            if s_class in ORDER:
+                ids = ORDER[s_class]
+                del ids[bisect_left(ids, self.id)]
             self.__class__.save_to_file()
 
     @classmethod
@@ -121,6 +130,33 @@ class Base():
         s_class = cls.__name__
         return DATA[s_class].get(id)
 
+    @classmethod
+    def page(cls, after: str = None, limit: int = None) \
+            -> Iterator[TypeVar('Base')]:
+        """ Objects in ID order, after the ID after, at most limit
+
+        IDs are kept sorted in ORDER once first paged, each chunk of
+        PAGE_CHUNK is found by bisection from the cursor position.
+        """
+        s_class = cls.__name__
+        if s_class not in ORDER:
+            ORDER[s_class] = sorted(DATA[s_class])
+        while limit is None or limit > 0:
+            ids = ORDER[s_class]
+            i = 0 if after is None else bisect_right(ids, after)
+            count = PAGE_CHUNK if limit is None else min(limit, PAGE_CHUNK)
+            chunk = ids[i:i + count]
+            if not chunk:
+                return
+            for obj_id in chunk:
+                obj = DATA[s_class].get(obj_id)
+                if obj is None:
+                    continue
+                yield obj
+                if limit is not None:
+                    limit -= 1
+            after = chunk[-1]
+
     @classmethod
     def search(cls, attributes: dict = {}) -> List[TypeVar('Base')]:
         """ Search all objects with matching attributes
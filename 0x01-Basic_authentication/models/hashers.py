@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+""" Password hashing schemes of User
+
+Stored hashes are "<scheme>$<parameters and hash>", except sha256-legacy
+which keeps the bare hex digest every existing user already has.
+"""
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict
+import base64
+import hashlib
+import hmac
+import os
+import threading
+import time
+
+try:
+    import bcrypt
+except ImportError:
+    bcrypt = None
+
+
+def b64(data: bytes) -> str:
+    """ Unpadded base64 of data
+    """
+    return base64.b64encode(data).decode().rstrip("=")
+
+
+def unb64(text: str) -> bytes:
+    """ Inverse of b64
+    """
+    return base64.b64decode(text + "=" * (-len(text) % 4))
+
+
+class Hasher():
+    """ One hashing scheme
+    """
+    name = None
+
+    def encode(self, pwd: str) -> str:
+        """ Stored form of pwd, prefixed with the scheme name
+        """
+        raise NotImplementedError
+
+    def verify(self, pwd: str, encoded: str) -> bool:
+        """ True when pwd matches the stored form encoded
+        """
+        raise NotImplementedError
+
+    def needs_update(self, encoded: str) -> bool:
+        """ True when encoded uses weaker parameters than encode would
+        """
+        return False
+
+
+class SHA256LegacyHasher(Hasher):
+    """ Unsalted SHA-256 hex digest
+    """
+    name = "sha256-legacy"
+
+    def encode(self, pwd: str) -> str:
+        """ Bare hex digest, the historical stored form
+        """
+        return hashlib.sha256(pwd.encode()).hexdigest().lower()
+
+    def verify(self, pwd: str, encoded: str) -> bool:
+        """ Constant time comparison of the digests
+        """
+        if encoded.startswith(self.name + "$"):
+            encoded = encoded[len(self.name) + 1:]
+        return hmac.compare_digest(self.encode(pwd), encoded.lower())
+
+
+class PBKDF2Hasher(Hasher):
+    """ PBKDF2-HMAC-SHA256: pbkdf2$<iterations>$<salt>$<hash>
+    """
+    name = "pbkdf2"
+
+    def __init__(self, iterations: int = None):
+        """ Hash with iterations (PBKDF2_ITERATIONS, default 100000)
+        """
+        self.iterations = iterations or \
+            int(os.getenv("PBKDF2_ITERATIONS", 100000))
+
+    def _hash(self, pwd: str, salt: bytes, iterations: int) -> bytes:
+        """ Raw derived key
+        """
+        return hashlib.pbkdf2_hmac("sha256", pwd.encode(), salt, iterations)
+
+    def encode(self, pwd: str) -> str:
+        """ Hash pwd with a new 16 byte salt
+        """
+        salt = os.urandom(16)
+        return "{}${}${}${}".format(self.name, self.iterations, b64(salt),
+                                    b64(self._hash(pwd, salt,
+                                                   self.iterations)))
+
+    def verify(self, pwd: str, encoded: str) -> bool:
+        """ Recompute with the stored salt and iterations
+        """
+        try:
+            _, iterations, salt, key = encoded.split("$")
+            expected = unb64(key)
+            key = self._hash(pwd, unb64(salt), int(iterations))
+        except ValueError:
+            return False
+        return hmac.compare_digest(key, expected)
+
+    def needs_update(self, encoded: str) -> bool:
+        """ Fewer iterations than configured
+        """
+        try:
+            return int(encoded.split("$")[1]) < self.iterations
+        except (IndexError, ValueError):
+            return True
+
+
+class ScryptHasher(Hasher):
+    """ scrypt: scrypt$<n>$<r>$<p>$<salt>$<hash>
+    """
+    name = "scrypt"
+
+    def __init__(self, n: int = 1 << 14, r: int = 8, p: int = 1):
+        """ Hash with cost n, block size r and parallelism p
+        """
+        self.n = n
+        self.r = r
+        self.p = p
+
+    @staticmethod
+    def _hash(pwd: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+        """ Raw derived key
+        """
+        return hashlib.scrypt(pwd.encode(), salt=salt, n=n, r=r, p=p,
+                              maxmem=256 * n * r + (1 << 20), dklen=32)
+
+    def encode(self, pwd: str) -> str:
+        """ Hash pwd with a new 16 byte salt
+        """
+        salt = os.urandom(16)
+        key = self._hash(pwd, salt, self.n, self.r, self.p)
+        return "{}${}${}${}${}${}".format(self.name, self.n, self.r, self.p,
+                                          b64(salt), b64(key))
+
+    def verify(self, pwd: str, encoded: str) -> bool:
+        """ Recompute with the stored salt and parameters
+        """
+        try:
+            _, n, r, p, salt, key = encoded.split("$")
+            expected = unb64(key)
+            key = self._hash(pwd, unb64(salt), int(n), int(r), int(p))
+        except ValueError:
+            return False
+        return hmac.compare_digest(key, expected)
+
+    def needs_update(self, encoded: str) -> bool:
+        """ Lower cost than configured
+        """
+        try:
+            return int(encoded.split("$")[1]) < self.n
+        except (IndexError, ValueError):
+            return True
+
+
+class BcryptHasher(Hasher):
+    """ bcrypt: bcrypt$<bcrypt hash>
+    """
+    name = "bcrypt"
+
+    def __init__(self, rounds: int = None):
+        """ Hash with rounds (BCRYPT_ROUNDS, default 12)
+        """
+        self.rounds = rounds or int(os.getenv("BCRYPT_ROUNDS", 12))
+
+    def encode(self, pwd: str) -> str:
+        """ Hash pwd with a new salt
+        """
+        hashed = bcrypt.hashpw(pwd.encode(), bcrypt.gensalt(self.rounds))
+        return "{}${}".format(self.name, hashed.decode())
+
+    def verify(self, pwd: str, encoded: str) -> bool:
+        """ bcrypt.checkpw against the stored hash
+        """
+        try:
+            return bcrypt.checkpw(pwd.encode(),
+                                  encoded[len(self.name) + 1:].encode())
+        except ValueError:
+            return False
+
+    def needs_update(self, encoded: str) -> bool:
+        """ Fewer rounds than configured
+        """
+        try:
+            return int(encoded.split("$")[3]) < self.rounds
+        except (IndexError, ValueError):
+            return True
+
+
+class HasherRegistry():
+    """ Hashers by scheme name, new hashes use the default scheme
+    """
+
+    def __init__(self, default: str = "sha256-legacy"):
+        """ Initialize with the built-in schemes available here
+        """
+        self.default = default
+        self.hashers: Dict[str, Hasher] = {}
+        self.register(SHA256LegacyHasher())
+        self.register(PBKDF2Hasher())
+        if hasattr(hashlib, "scrypt"):
+            self.register(ScryptHasher())
+        if bcrypt is not None:
+            self.register(BcryptHasher())
+
+    def register(self, hasher: Hasher):
+        """ Add (or replace) the hasher of a scheme
+        """
+        self.hashers[hasher.name] = hasher
+
+    def get(self, name: str) -> Hasher:
+        """ Hasher of scheme name
+        """
+        hasher = self.hashers.get(name)
+        if hasher is None:
+            raise ValueError("unknown password scheme: {}".format(name))
+        return hasher
+
+    def identify(self, encoded: str) -> Hasher:
+        """ Hasher that produced encoded, prefix-less hashes are legacy
+        """
+        name = encoded.split("$", 1)[0] if "$" in encoded else None
+        return self.hashers.get(name) or self.hashers["sha256-legacy"]
+
+    def encode(self, pwd: str, scheme: str = None) -> str:
+        """ Stored form of pwd in scheme (default scheme when None)
+        """
+        return self.get(scheme or self.default).encode(pwd)
+
+    def verify(self, pwd: str, encoded: str) -> bool:
+        """ True when pwd matches encoded, whatever its scheme
+        """
+        return self.identify(encoded).verify(pwd, encoded)
+
+    def needs_update(self, encoded: str) -> bool:
+        """ True when encoded is not what encode would produce now
+        """
+        hasher = self.identify(encoded)
+        return hasher.name != self.default or hasher.needs_update(encoded)
+
+
+class Overloaded(RuntimeError):
+    """ Raised instead of queueing when the verify executor is full
+    """
+
+
+class VerifyExecutor():
+    """ Thread pool for password hashing with a bounded queue
+
+    At most workers hashes run at once and at most max_queue more wait,
+    submit raises Overloaded right away beyond that. stats() reports the
+    time jobs spent queued. workers <= 0 runs jobs inline.
+    """
+
+    def __init__(self, workers: int, max_queue: int):
+        """ Initialize the pool
+        """
+        self.workers = workers
+        self.max_queue = max_queue
+        self._pool = ThreadPoolExecutor(workers, "password") \
+            if workers > 0 else None
+        self._slots = threading.BoundedSemaphore(max(workers, 0) + max_queue)
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.rejected = 0
+        self.started = 0
+        self.completed = 0
+        self.queue_time = 0.0
+        self.max_queue_time = 0.0
+
+    def _started(self, queued: float):
+        """ Account for a job starting after queued seconds
+        """
+        with self._lock:
+            self.started += 1
+            self.queue_time += queued
+            if queued > self.max_queue_time:
+                self.max_queue_time = queued
+
+    def submit(self, fn, *args) -> Future:
+        """ Run fn(*args) on the pool, raise Overloaded when it is full
+        """
+        if self._pool is None:
+            future = Future()
+            future.set_result(fn(*args))
+            return future
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise Overloaded("password verification queue is full")
+        with self._lock:
+            self.submitted += 1
+        enqueued = time.perf_counter()
+
+        def job():
+            """ fn(*args), releasing the slot once done
+            """
+            self._started(time.perf_counter() - enqueued)
+            try:
+                return fn(*args)
+            finally:
+                with self._lock:
+                    self.completed += 1
+                self._slots.release()
+        try:
+            return self._pool.submit(job)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def run(self, fn, *args):
+        """ submit(fn, *args) and wait for the result
+        """
+        return self.submit(fn, *args).result()
+
+    def stats(self) -> dict:
+        """ Counters and queue times (ms) since startup
+        """
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "submitted": self.submitted,
+                "rejected": self.rejected,
+                "started": self.started,
+                "completed": self.completed,
+                "queue_time_avg_ms": self.queue_time * 1000 /
+                self.started if self.started else 0.0,
+                "queue_time_max_ms": self.max_queue_time * 1000,
+            }
+
+
+_verify_executor = None
+_verify_executor_lock = threading.Lock()
+
+
+def verify_executor() -> VerifyExecutor:
+    """ Shared executor, sized by PASSWORD_WORKERS (default: CPU count)
+    and PASSWORD_QUEUE (default 64)
+    """
+    global _verify_executor
+    if _verify_executor is None:
+        with _verify_executor_lock:
+            if _verify_executor is None:
+                _verify_executor = VerifyExecutor(
+                    int(os.getenv("PASSWORD_WORKERS", os.cpu_count() or 1)),
+                    int(os.getenv("PASSWORD_QUEUE", 64)))
+    return _verify_executor
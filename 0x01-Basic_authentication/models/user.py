@@ -1,14 +1,21 @@
 #!/usr/bin/env python3
 """ User module
 """
-import hashlib
 from models.base import Base
+from models.hashers import HasherRegistry, Overloaded, verify_executor
+import os
 
 
 class User(Base):
     """ User class
+
+    hashers: password schemes, new passwords use PASSWORD_SCHEME
+    (sha256-legacy by default) and valid passwords stored with another
+    scheme are rehashed on verification
     """
 
+    hashers = HasherRegistry(os.getenv("PASSWORD_SCHEME", "sha256-legacy"))
+
     def __init__(self, *args: list, **kwargs: dict):
         """ Initialize a User instance
         """
@@ -26,22 +33,35 @@ class User(Base):
 
     @password.setter
     def password(self, pwd: str):
-        """ Setter of a new password: encrypt in SHA256
+        """ Setter of a new password: hash with the default scheme
         """
         if pwd is None or type(pwd) is not str:
             self._password = None
         else:
-            self._password = hashlib.sha256(pwd.encode()).hexdigest().lower()
+            self._password = self.hashers.encode(pwd)
 
     def is_valid_password(self, pwd: str) -> bool:
         """ Validate a password
+
+        Hashing runs on the shared verify executor, which raises
+        models.hashers.Overloaded when its queue is full. A verified
+        password whose upgrade rehash finds the queue full is upgraded
+        on a later login instead
         """
         if pwd is None or type(pwd) is not str:
             return False
         if self.password is None:
             return False
-        pwd_e = pwd.encode()
-        return hashlib.sha256(pwd_e).hexdigest().lower() == self.password
+        executor = verify_executor()
+        if not executor.run(self.hashers.verify, pwd, self.password):
+            return False
+        if self.hashers.needs_update(self.password):
+            try:
+                self._password = executor.run(self.hashers.encode, pwd)
+            except Overloaded:
+                return True
+            self.save()
+        return True
 
     def display_name(self) -> str:
         """ Display User name based on email/first_name/last_name
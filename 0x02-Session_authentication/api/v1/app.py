@@ -2,13 +2,14 @@
 """Route module for the API."""
 from os import getenv
 from api.v1.views import app_views
-from api.v1.auth.auth import Auth
+from api.v1.auth.auth import Auth, ExcludedPaths
 from api.v1.auth.basic_auth import BasicAuth
 from api.v1.auth.session_auth import SessionAuth
 from api.v1.auth.session_exp_auth import SessionExpAuth
 from api.v1.auth.session_db_auth import SessionDBAuth
 from flask import Flask, jsonify, abort, request
 from flask_cors import (CORS, cross_origin)
+from models.hashers import Overloaded
 import os
 
 
@@ -28,6 +29,12 @@ try:
     auth = a[authT]()
 except Exception:
     auth = BasicAuth()
+excluded_paths = ExcludedPaths([
+    '/api/v1/status/',
+    '/api/v1/unauthorized/',
+    '/api/v1/forbidden/',
+    '/api/v1/auth_session/login/',
+])
 
 
 @app.errorhandler(401)
@@ -48,22 +55,24 @@ def not_found(error) -> str:
     return jsonify({"error": "Not found"}), 404
 
 
+@app.errorhandler(Overloaded)
+def overloaded(error) -> str:
+    """Password verification queue full handler."""
+    return jsonify({"error": "Service Unavailable"}), 503, \
+        {"Retry-After": "1"}
+
+
 @app.before_request
 def authenticate_user():
     """Authenticate a user before processing a request."""
     if auth:
-        setattr(request, "current_user", auth.current_user(request))
-        null = [
-            '/api/v1/status/',
-            '/api/v1/unauthorized/',
-            '/api/v1/forbidden/',
-            '/api/v1/auth_session/login/',
-        ]
-        if auth.require_auth(request.path, null):
+        setattr(request, "current_user", None)
+        if auth.require_auth(request.path, excluded_paths):
             if not auth.authorization_header(request) and \
                   not auth.session_cookie(request):
                 abort(401)
-            if auth.current_user(request) is None:
+            setattr(request, "current_user", auth.resolve_user(request))
+            if request.current_user is None:
                 abort(403)
 
 
@@ -5,9 +5,58 @@ for web requests, such as determining if a path requires authentication,
 retrieving the authorization header, and identifying the current user.
 """
 
-from flask import request
-from typing import List, TypeVar
+from flask import g, request
+from functools import lru_cache
+from typing import List, TypeVar, Union
 import os
+import re
+import threading
+
+
+class ExcludedPaths:
+    """
+    Paths that do not require authentication, compiled once.
+
+    An entry ending with "*" excludes every path starting with what comes
+    before it, any other entry excludes exactly that path, with or
+    without its trailing slash. All entries are joined into a single
+    regular expression, and results are cached per path.
+
+    Methods
+    -------
+    match(path: str) -> bool
+        True if path is excluded.
+    """
+
+    def __init__(self, excluded_paths: List[str],
+                 cache_size: int = 1024) -> None:
+        """Compile excluded_paths."""
+        self.excluded_paths = tuple(excluded_paths or ())
+        exact = []
+        prefixes = []
+        for x in self.excluded_paths:
+            if x.endswith("*"):
+                prefixes.append(re.escape(x.rstrip("*")))
+            else:
+                exact.append(re.escape(x.rstrip("/")) + "/?")
+        alternatives = ["(?:{})$".format("|".join(exact))] if exact else []
+        if prefixes:
+            alternatives.append("|".join(prefixes))
+        self.pattern = re.compile("|".join(alternatives)) \
+            if alternatives else None
+        self.match = lru_cache(maxsize=cache_size)(self._match)
+
+    def _match(self, path: str) -> bool:
+        """Uncached match."""
+        if self.pattern is None:
+            return False
+        return self.pattern.match(path) is not None
+
+
+@lru_cache(maxsize=32)
+def compile_excluded_paths(excluded_paths: tuple) -> ExcludedPaths:
+    """ExcludedPaths of a tuple of paths, compiled once per tuple."""
+    return ExcludedPaths(excluded_paths)
 
 
 class Auth:
@@ -16,7 +65,7 @@ class Auth:
 
     Methods
     -------
-    require_auth(path: str, excluded_paths: List[str]) -> bool
+    require_auth(path: str, excluded_paths: ExcludedPaths) -> bool
         Determines if the requested path requires authentication.
 
     authorization_header(request=None) -> str
@@ -25,13 +74,21 @@ class Auth:
     current_user(request=None) -> TypeVar('User')
         Retrieves the current user based on the request
         (placeholder implementation).
+
+    resolve_user(request=None) -> TypeVar('User')
+        current_user, memoized for the duration of the request.
     """
 
+    resolutions = 0
+    _resolutions_lock = threading.Lock()
+
     def __init__(self) -> None:
         """Initialize the Auth class."""
         pass
 
-    def require_auth(self, path: str, excluded_paths: List[str]) -> bool:
+    def require_auth(self, path: str,
+                     excluded_paths: Union[List[str], ExcludedPaths]) \
+            -> bool:
         """
         Determine if the requested path requires authentication.
 
@@ -39,8 +96,9 @@ class Auth:
         ----------
         path : str
             The path being accessed.
-        excluded_paths : List[str]
-            A list of paths that do not require authentication.
+        excluded_paths : ExcludedPaths or List[str]
+            The paths that do not require authentication, a list is
+            compiled on first use.
 
         Returns
         -------
@@ -51,14 +109,9 @@ class Auth:
             return True
         if not excluded_paths:
             return True
-        for x in excluded_paths:
-            if "*" in x:
-                ex = x.split("*")[0]
-                if ex in path:
-                    return False
-            if path in x:
-                return False
-        return True
+        if not isinstance(excluded_paths, ExcludedPaths):
+            excluded_paths = compile_excluded_paths(tuple(excluded_paths))
+        return not excluded_paths.match(path)
 
     def authorization_header(self, request=None) -> str:
         """
@@ -97,6 +150,34 @@ class Auth:
         """
         return None
 
+    def resolve_user(self, request=None) -> TypeVar('User'):
+        """
+        Resolve current_user(request) at most once per request.
+
+        The result is kept on flask.g, so every later call in the same
+        request (hooks, views, any auth subclass) reuses it.
+        g.auth_resolutions and Auth.resolutions count the actual
+        current_user calls, per request and since startup.
+
+        Parameters
+        ----------
+        request : Flask request object, optional
+            The request object used to determine the current user.
+
+        Returns
+        -------
+        TypeVar('User')
+            The current user, or None.
+        """
+        if '_auth_user' in g:
+            return g._auth_user
+        user = self.current_user(request)
+        g._auth_user = user
+        g.auth_resolutions = g.get('auth_resolutions', 0) + 1
+        with Auth._resolutions_lock:
+            Auth.resolutions += 1
+        return user
+
     def session_cookie(self, request=None):
         """Get cookie from request."""
         if not request:
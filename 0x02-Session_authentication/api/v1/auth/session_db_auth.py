@@ -1,31 +1,107 @@
 #!/usr/bin/env python3
 """SessionDB auth ."""
 from .session_exp_auth import SessionExpAuth
+from models.engine import storage
+from models.session_table import SessionTable, to_epoch
 from models.user_session import UserSession
+from uuid import uuid4
+import os
+import threading
+import time
 
 
 class SessionDBAuth(SessionExpAuth):
-    """SessionDB auth ."""
+    """SessionDB auth .
+
+    Sessions are always looked up in the storage, through its
+    session_id index, so every process sees the logins and logouts of
+    the others. With the sqlite and mmap storages, a SessionTable shared
+    by every instance also caches the sessions this process has seen,
+    streamed from the storage on first use, for the expiry scan. The
+    json storage already holds every UserSession in memory and needs no
+    table. Expired sessions are purged by create_session, at most once
+    every SESSION_PURGE_INTERVAL seconds (default 60). The json and mmap
+    storages keep a per-process view of their files, several workers
+    sharing sessions need the sqlite storage.
+    """
+    sessions = None
+    _sessions_lock = threading.Lock()
+    purge_interval = int(os.getenv("SESSION_PURGE_INTERVAL", 60))
+    next_purge = 0.0
+    _purge_lock = threading.Lock()
+
+    @classmethod
+    def session_table(cls) -> SessionTable:
+        """Shared session table, loaded on first use, None with a storage
+        keeping every object in memory."""
+        if storage.in_memory:
+            return None
+        if cls.sessions is None:
+            with cls._sessions_lock:
+                if cls.sessions is None:
+                    table = SessionTable()
+                    UserSession.load_from_file()
+                    table.add_objects(UserSession.page())
+                    cls.sessions = table
+        return cls.sessions
 
     def create_session(self, user_id=None):
         """Override Create Session."""
-        session_id = super().create_session(user_id)
-        if not session_id:
+        if not user_id or type(user_id) != str:
             return None
+        session_id = str(uuid4())
         data = {
             "user_id": user_id,
             "session_id": session_id
         }
         user = UserSession(**data)
         user.save()
+        table = self.session_table()
+        if table is not None:
+            table.add(user.id, user_id, session_id,
+                      to_epoch(user.created_at), to_epoch(user.updated_at))
+        self.maybe_purge()
         return session_id
 
+    def lookup(self, session_id: str) -> tuple:
+        """(user_id, created_at epoch) of session_id or None, from the
+        storage, updating the session table with the answer."""
+        user_sessions = UserSession.search({"session_id": session_id})
+        table = self.session_table()
+        if not user_sessions:
+            if table is not None:
+                table.remove(session_id)
+            return None
+        user_session = user_sessions[0]
+        created_at = to_epoch(user_session.created_at)
+        if table is not None and table.lookup(session_id) is None:
+            table.add(user_session.id, user_session.user_id, session_id,
+                      created_at, to_epoch(user_session.updated_at))
+        return user_session.user_id, created_at
+
     def user_id_for_session_id(self, session_id=None):
         """Override user from session ID."""
-        user_id = UserSession.search({"session_id": session_id})
-        if user_id:
+        if not session_id or type(session_id) != str:
+            return None
+        found = self.lookup(session_id)
+        if found is None:
+            return None
+        user_id, created_at = found
+        if self.session_duration <= 0:
             return user_id
-        return None
+        if created_at + self.session_duration < time.time():
+            return None
+        return user_id
+
+    def forget(self, session_id: str) -> bool:
+        """Delete the UserSession of session_id, False if none."""
+        table = self.session_table()
+        if table is not None:
+            table.remove(session_id)
+        user_sessions = UserSession.search({"session_id": session_id})
+        for user_session in user_sessions:
+            user_session.remove(wait=False)
+        return bool(user_sessions)
 
     def destroy_session(self, request=None):
         """Del session."""
@@ -34,8 +110,39 @@ class SessionDBAuth(SessionExpAuth):
         session_id = self.session_cookie(request)
         if not session_id:
             return False
-        user_session = UserSession.search({"session_id": session_id})
-        if user_session:
-            user_session[0].remove()
-            return True
-        return False
+        return self.forget(session_id)
+
+    def expired(self) -> list:
+        """Session IDs older than session_duration."""
+        table = self.session_table()
+        if table is not None:
+            return table.expired(self.session_duration)
+        cutoff = time.time() - self.session_duration
+        return [s.session_id for s in UserSession.all()
+                if to_epoch(s.created_at) < cutoff]
+
+    def purge_expired(self) -> int:
+        """Delete the expired sessions, return how many."""
+        if self.session_duration <= 0:
+            return 0
+        count = 0
+        for session_id in self.expired():
+            if self.forget(session_id):
+                count += 1
+        if count:
+            UserSession.save_to_file()
+        return count
+
+    def maybe_purge(self) -> int:
+        """purge_expired once purge_interval elapsed since the last
+        purge, in one thread at a time; return how many were purged."""
+        cls = type(self)
+        now = time.time()
+        if self.purge_interval < 0 or now < cls.next_purge or \
+                not cls._purge_lock.acquire(blocking=False):
+            return 0
+        try:
+            cls.next_purge = now + self.purge_interval
+            return self.purge_expired()
+        finally:
+            cls._purge_lock.release()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+""" Benchmark password verification of every User hashing scheme under
+concurrency, and check that upgrade-on-verify rewrites legacy hashes
+
+usage: ./bench_hashing.py [threads ...]   (default: 1 4 16)
+"""
+from concurrent.futures import ThreadPoolExecutor
+from models.hashers import HasherRegistry
+import sys
+import time
+
+
+def verify_cost(registry: HasherRegistry, scheme: str, threads: int,
+                verifications: int) -> tuple:
+    """ (verifications per second, p50 and p99 latency in ms) of
+    verifications run on threads threads
+    """
+    encoded = registry.encode("correct horse", scheme)
+
+    def verify(_):
+        start = time.perf_counter()
+        assert registry.verify("correct horse", encoded)
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(threads) as pool:
+        start = time.perf_counter()
+        latencies = sorted(pool.map(verify, range(verifications)))
+        elapsed = time.perf_counter() - start
+    return (verifications / elapsed,
+            latencies[len(latencies) // 2] * 1000,
+            latencies[min(len(latencies) - 1,
+                          len(latencies) * 99 // 100)] * 1000)
+
+
+if __name__ == "__main__":
+    thread_counts = [int(arg) for arg in sys.argv[1:]] or [1, 4, 16]
+    registry = HasherRegistry("pbkdf2")
+    legacy = registry.encode("pwd", "sha256-legacy")
+    assert registry.verify("pwd", legacy) and registry.needs_update(legacy)
+    upgraded = registry.encode("pwd")
+    assert registry.verify("pwd", upgraded)
+    assert not registry.needs_update(upgraded)
+    print("upgrade sha256-legacy -> pbkdf2: ok")
+
+    print("{:<14} {:>7} {:>12} {:>9} {:>9}".format(
+        "scheme", "threads", "verify/s", "p50 ms", "p99 ms"))
+    for scheme in registry.hashers:
+        single = verify_cost(registry, scheme, 1, 3)[1] / 1000
+        verifications = max(20, min(20000, int(2 / single)))
+        for threads in thread_counts:
+            rate, p50, p99 = verify_cost(registry, scheme, threads,
+                                         verifications)
+            print("{:<14} {:>7} {:>12.1f} {:>9.3f} {:>9.3f}".format(
+                scheme, threads, rate, p50, p99))
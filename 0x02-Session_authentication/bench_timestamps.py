@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+""" Benchmark the timestamp codec of models.base against strptime/strftime
+and check that both produce the same values and bytes
+"""
+from datetime import datetime, timedelta
+from models.base import TIMESTAMP_FORMAT, format_timestamp, parse_timestamp
+import random
+import timeit
+
+
+def samples(n: int) -> list:
+    """ n random datetimes with microseconds, like datetime.utcnow()
+    """
+    start = datetime(1000, 1, 1)
+    span = (datetime(9999, 12, 31) - start).total_seconds()
+    return [start + timedelta(seconds=random.random() * span)
+            for _ in range(n)]
+
+
+if __name__ == "__main__":
+    values = samples(100000)
+    texts = [v.strftime(TIMESTAMP_FORMAT) for v in values]
+    for value, text in zip(values, texts):
+        assert format_timestamp(value) == text
+        assert parse_timestamp(text) == datetime.strptime(text,
+                                                          TIMESTAMP_FORMAT)
+        assert format_timestamp(parse_timestamp(text)) == text
+    print("round trips identical: {}".format(len(values)))
+
+    number = 3
+    for name, old, new in (
+        ("parse",
+         lambda: [datetime.strptime(t, TIMESTAMP_FORMAT) for t in texts],
+         lambda: [parse_timestamp(t) for t in texts]),
+        ("format",
+         lambda: [v.strftime(TIMESTAMP_FORMAT) for v in values],
+         lambda: [format_timestamp(v) for v in values]),
+    ):
+        t_old = timeit.timeit(old, number=number) / number
+        t_new = timeit.timeit(new, number=number) / number
+        print("{:<7} strptime/strftime {:.3f}s  codec {:.3f}s  {:.1f}x"
+              .format(name, t_old, t_new, t_old / t_new))
@@ -2,36 +2,70 @@
 """ Base module
 """
 from datetime import datetime
-from typing import TypeVar, List, Iterable
-from os import path
-import json
+from typing import TypeVar, List, Iterable, Iterator
+from models.engine import storage
 import uuid
 
 
 TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
-DATA = {}
+
+
+def parse_timestamp(value: str) -> datetime:
+    """ datetime.strptime(value, TIMESTAMP_FORMAT), fast path for the
+    canonical 19 character form
+    """
+    if len(value) == 19 and value[4] == '-' and value[7] == '-' and \
+            value[10] == 'T' and value[13] == ':' and value[16] == ':':
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            pass
+    return datetime.strptime(value, TIMESTAMP_FORMAT)
+
+
+def format_timestamp(value: datetime) -> str:
+    """ value.strftime(TIMESTAMP_FORMAT), fast path for naive datetimes
+    whose year has 4 digits
+    """
+    if value.tzinfo is None and value.year >= 1000:
+        return value.isoformat(timespec='seconds')
+    return value.strftime(TIMESTAMP_FORMAT)
 
 
 class Base():
     """ Base class
+
+    Subclasses declare their attributes in __slots__, to_json serializes
+    the declared fields (in declaration order) plus __dict__ for classes
+    that do not use slots.
     """
 
+    __slots__ = ('id', 'created_at', 'updated_at')
+    _indexes = ()
+    _fields = __slots__
+
+    def __init_subclass__(cls, **kwargs):
+        """ Collect the slots of cls and its bases into _fields
+        """
+        super().__init_subclass__(**kwargs)
+        fields = []
+        for klass in reversed(cls.__mro__):
+            for name in klass.__dict__.get('__slots__', ()):
+                if name not in ('__dict__', '__weakref__') and \
+                        name not in fields:
+                    fields.append(name)
+        cls._fields = tuple(fields)
+
     def __init__(self, *args: list, **kwargs: dict):
         """ Initialize a Base instance
         """
-        s_class = str(self.__class__.__name__)
-        if DATA.get(s_class) is None:
-            DATA[s_class] = {}
-
         self.id = kwargs.get('id', str(uuid.uuid4()))
         if kwargs.get('created_at') is not None:
-            self.created_at = datetime.strptime(kwargs.get('created_at'),
-                                                TIMESTAMP_FORMAT)
+            self.created_at = parse_timestamp(kwargs.get('created_at'))
         else:
             self.created_at = datetime.utcnow()
         if kwargs.get('updated_at') is not None:
-            self.updated_at = datetime.strptime(kwargs.get('updated_at'),
-                                                TIMESTAMP_FORMAT)
+            self.updated_at = parse_timestamp(kwargs.get('updated_at'))
         else:
             self.updated_at = datetime.utcnow()
 
@@ -48,11 +82,14 @@ class Base():
         """ Convert the object a JSON dictionary
         """
         result = {}
-        for key, value in self.__dict__.items():
+        items = [(key, getattr(self, key)) for key in self._fields]
+        if hasattr(self, '__dict__'):
+            items.extend(self.__dict__.items())
+        for key, value in items:
             if not for_serialization and key[0] == '_':
                 continue
             if type(value) is datetime:
-                result[key] = value.strftime(TIMESTAMP_FORMAT)
+                result[key] = format_timestamp(value)
             else:
                 result[key] = value
         return result
@@ -61,52 +98,33 @@ class Base():
     def load_from_file(cls):
         """ Load all objects from file
         """
-        s_class = cls.__name__
-        file_path = ".db_{}.json".format(s_class)
-        DATA[s_class] = {}
-        if not path.exists(file_path):
-            return
-
-        with open(file_path, 'r') as f:
-            objs_json = json.load(f)
-            for obj_id, obj_json in objs_json.items():
-                DATA[s_class][obj_id] = cls(**obj_json)
+        storage.load(cls)
 
     @classmethod
     def save_to_file(cls):
         """ Save all objects to file
         """
-        s_class = cls.__name__
-        file_path = ".db_{}.json".format(s_class)
-        objs_json = {}
-        for obj_id, obj in DATA[s_class].items():
-            objs_json[obj_id] = obj.to_json(True)
-
-        with open(file_path, 'w') as f:
-            json.dump(objs_json, f)
+        storage.sync(cls)
 
-    def save(self):
+    def save(self, wait: bool = True):
         """ Save current object
+
+        wait: block until the write is persisted when the storage
+        defers writes
         """
-        s_class = self.__class__.__name__
         self.updated_at = datetime.utcnow()
-        DATA[s_class][self.id] = self
-        self.__class__.save_to_file()
+        storage.save(self, wait)
 
-    def remove(self):
+    def remove(self, wait: bool = True):
         """ Remove object
         """
-        s_class = self.__class__.__name__
-        if DATA[s_class].get(self.id) is not None:
-            del DATA[s_class][self.id]
-            self.__class__.save_to_file()
+        storage.remove(self, wait)
 
     @classmethod
     def count(cls) -> int:
         """ Count all objects
         """
-        s_class = cls.__name__
-        return len(DATA[s_class].keys())
+        return storage.count(cls)
 
     @classmethod
     def all(cls) -> Iterable[TypeVar('Base')]:
@@ -118,21 +136,18 @@ class Base():
     def get(cls, id: str) -> TypeVar('Base'):
         """ Return one object by ID
         """
-        s_class = cls.__name__
-        return DATA[s_class].get(id)
+        return storage.get(cls, id)
+
+    @classmethod
+    def page(cls, after: str = None, limit: int = None) \
+            -> Iterator[TypeVar('Base')]:
+        """ Objects in ID order, after the ID after, at most limit,
+        loaded as they are consumed
+        """
+        return storage.page(cls, after, limit)
 
     @classmethod
     def search(cls, attributes: dict = {}) -> List[TypeVar('Base')]:
         """ Search all objects with matching attributes
         """
-        s_class = cls.__name__
-
-        def _search(obj):
-            if len(attributes) == 0:
-                return True
-            for k, v in attributes.items():
-                if (getattr(obj, k) != v):
-                    return False
-            return True
-
-        return list(filter(_search, DATA[s_class].values()))
+        return storage.search(cls, attributes)
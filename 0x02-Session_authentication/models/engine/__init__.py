@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+""" Storage backend of the models, picked by MODEL_STORAGE:
+json (default), sqlite or mmap
+
+The sqlite and mmap backends import the objects of the json storage
+files (.db_<Class>.json) the first time they create the store of a class.
+"""
+from models.engine.storage import Storage
+import os
+
+
+def get_storage(name: str = None) -> Storage:
+    """ New storage backend by name
+    """
+    name = name or os.getenv("MODEL_STORAGE", "json")
+    if name == "sqlite":
+        from models.engine.sqlite_storage import SQLiteStorage
+        return SQLiteStorage()
+    if name == "mmap":
+        from models.engine.mmap_storage import MmapStorage
+        return MmapStorage()
+    if name == "json":
+        from models.engine.json_storage import JsonFileStorage
+        return JsonFileStorage()
+    raise ValueError("unknown MODEL_STORAGE: {}".format(name))
+
+
+storage = get_storage()
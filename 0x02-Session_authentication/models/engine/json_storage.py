@@ -0,0 +1,650 @@
+#!/usr/bin/env python3
+""" JSON file storage: the objects of each class in .db_<Class>.json
+"""
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Callable, TypeVar, List, Iterable
+from os import path
+from models.engine.storage import Index, SortedIds, Storage, PAGE_CHUNK, \
+    file_mode
+import atexit
+import json
+import os
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+WRITE_MODE = os.getenv("DB_WRITE_MODE", "snapshot")
+COMPACT_EVERY = int(os.getenv("DB_COMPACT_EVERY", 1000))
+GROUP_COMMIT_MS = float(os.getenv("DB_GROUP_COMMIT_MS", 0))
+LAZY_LOAD = os.getenv("DB_LAZY_LOAD", "0") == "1"
+LOCK_STRIPES = 64
+JOURNALS = {}
+COMMITTERS = {}
+GENERATIONS = {}
+SNAPSHOT_LOCKS = {}
+
+
+class FileLock():
+    """ flock(2) on lock_path, shared by every process using the store
+
+    Only excludes other processes: threads of one process share the
+    descriptor, so callers also hold a threading lock. Does nothing where
+    fcntl is unavailable.
+    """
+
+    def __init__(self, lock_path: str):
+        """ Initialize, the file is opened on first use
+        """
+        self.lock_path = lock_path
+        self._file = None
+
+    @contextmanager
+    def held(self, shared: bool = False):
+        """ Hold the lock (shared or exclusive) for the with block
+        """
+        if fcntl is None:
+            yield
+            return
+        if self._file is None:
+            self._file = open(self.lock_path, 'a')
+        fcntl.flock(self._file.fileno(),
+                    fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+
+
+class Journal():
+    """ Append-only log of the saves and removes of one class
+
+    One JSON line per mutation: {"id": ..., "obj": {...}} for a save,
+    {"id": ..., "removed": true} for a remove. While a compaction runs
+    the log being folded into the snapshot is kept as <file>.compacting.
+
+    Several processes may share the log: appends and rotation hold
+    <file>.lock, and an append reopens the log when another process
+    rotated it. Compaction and loading hold <file>.compact.lock.
+    """
+
+    def __init__(self, file_path: str):
+        """ Initialize a journal appending to file_path
+        """
+        self.file_path = file_path
+        self.compacting_path = file_path + ".compacting"
+        self.lock = threading.Lock()
+        self.compact_lock = threading.Lock()
+        self.file_lock = FileLock(file_path + ".lock")
+        self.compact_file_lock = FileLock(file_path + ".compact.lock")
+        self.entries = 0
+        self._file = None
+
+    def _is_current(self) -> bool:
+        """ True when the open log is still the file at file_path
+        """
+        try:
+            st = os.stat(self.file_path)
+        except FileNotFoundError:
+            return False
+        fst = os.fstat(self._file.fileno())
+        return (st.st_dev, st.st_ino) == (fst.st_dev, fst.st_ino)
+
+    def append(self, records: List[dict], sync: bool = False) -> int:
+        """ Append records in one write, return the number of entries
+        in the log
+
+        sync: fsync the log before returning
+        """
+        data = "".join(json.dumps(record) + "\n" for record in records)
+        with self.lock, self.file_lock.held():
+            if self._file is not None and not self._is_current():
+                self._file.close()
+                self._file = None
+                self.entries = 0
+            if self._file is None:
+                self._file = open(self.file_path, 'a')
+            self._file.write(data)
+            self._file.flush()
+            if sync:
+                os.fsync(self._file.fileno())
+            self.entries += len(records)
+            return self.entries
+
+    def rotate(self) -> bool:
+        """ Move the log aside for compaction, caller holds the lock and
+        the compaction locks
+
+        A .compacting log left by an interrupted compaction is folded
+        first, so it is never overwritten: returns False then.
+        """
+        with self.file_lock.held():
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self.entries = 0
+            if path.exists(self.compacting_path):
+                return False
+            if path.exists(self.file_path):
+                os.replace(self.file_path, self.compacting_path)
+            return True
+
+    def sync(self):
+        """ fsync the log
+        """
+        with self.lock:
+            if self._file is not None:
+                os.fsync(self._file.fileno())
+
+    def close(self):
+        """ Close the log file
+        """
+        with self.lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    @staticmethod
+    def replay(file_path: str, objs_json: dict) -> int:
+        """ Apply the records of file_path to objs_json
+
+        A torn last line (crash mid-append) is ignored.
+        """
+        if not path.exists(file_path):
+            return 0
+        count = 0
+        with open(file_path, 'r') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                if record.get("removed"):
+                    objs_json.pop(record["id"], None)
+                else:
+                    objs_json[record["id"]] = record["obj"]
+                count += 1
+        return count
+
+
+class GroupCommit():
+    """ Coalesces the writes of one class into a single durable flush
+
+    Writes submitted from any thread within `window` seconds of each other
+    are handed together to `flush`, run on a background thread. Each
+    submit returns a Future that resolves once its write is durable.
+    Batches are taken and flushed under one lock, so they reach the
+    journal in submission order whichever thread flushes them.
+    """
+
+    def __init__(self, flush: Callable[[List[dict]], None],
+                 window: float):
+        """ Initialize a committer calling flush(records)
+        """
+        self.flush = flush
+        self.window = window
+        self._cond = threading.Condition()
+        self._pending = []
+        self._thread = None
+        self._commit_lock = threading.Lock()
+
+    def submit(self, record: dict) -> Future:
+        """ Queue one record for the next flush
+        """
+        future = Future()
+        with self._cond:
+            self._pending.append((record, future))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run,
+                                                daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        return future
+
+    def _take(self) -> list:
+        """ Swap out the pending writes
+        """
+        with self._cond:
+            pending, self._pending = self._pending, []
+        return pending
+
+    def _commit(self):
+        """ Take the pending writes, flush them and resolve their futures
+        """
+        with self._commit_lock:
+            pending = self._take()
+            if pending:
+                self._flush(pending)
+
+    def _flush(self, pending: list):
+        """ Flush a batch and resolve its futures (under _commit_lock)
+        """
+        try:
+            self.flush([record for record, _ in pending])
+        except Exception as e:
+            for _, future in pending:
+                future.set_exception(e)
+        else:
+            for _, future in pending:
+                future.set_result(None)
+
+    def _run(self):
+        """ Wait for writes, let the window fill up, flush
+        """
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+            time.sleep(self.window)
+            self._commit()
+
+    def drain(self):
+        """ Flush whatever is pending on the calling thread
+        """
+        self._commit()
+
+
+class Table():
+    """ Objects of one class by ID, with their secondary indexes
+
+    Writers take the lock of the ID's stripe so a save or remove updates
+    the objects and the indexes together. Readers never lock: get is a
+    single dict lookup and values/items copy the dict in one step, so
+    iterating never races with concurrent writes.
+
+    Records loaded lazily stay raw dicts in `raw` until get or a scan
+    first needs them, then `factory` turns them into objects.
+    """
+
+    def __init__(self, index_attrs: Iterable[str] = (),
+                 factory: Callable[..., TypeVar('Base')] = None):
+        """ Initialize an empty table indexed on index_attrs
+        """
+        self.objs = {}
+        self.raw = {}
+        self.factory = factory
+        self.indexes = {attr: Index(attr) for attr in index_attrs}
+        self.order = SortedIds(lambda: set(self.objs) | set(self.raw))
+        self._locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+
+    def lock_for(self, obj_id: str) -> threading.Lock:
+        """ Lock of the stripe obj_id belongs to
+        """
+        return self._locks[hash(obj_id) % LOCK_STRIPES]
+
+    def put(self, obj: TypeVar('Base')):
+        """ Insert or replace obj, caller holds lock_for(obj.id)
+        """
+        self.objs[obj.id] = obj
+        self.raw.pop(obj.id, None)
+        self.order.add(obj.id)
+        for index in self.indexes.values():
+            index.add(obj)
+
+    def put_raw(self, obj_json: dict):
+        """ Insert a record without building its object (load only)
+        """
+        obj_id = obj_json["id"]
+        self.raw[obj_id] = obj_json
+        for attr, index in self.indexes.items():
+            index.put(obj_id, obj_json.get(attr))
+
+    def pop(self, obj_id: str):
+        """ Remove an object, caller holds lock_for(obj_id)
+
+        Returns the object (or its raw record), None when absent.
+        """
+        obj = self.objs.pop(obj_id, None)
+        if obj is None:
+            obj = self.raw.pop(obj_id, None)
+        if obj is not None:
+            self.order.discard(obj_id)
+            for index in self.indexes.values():
+                index.discard(obj_id)
+        return obj
+
+    def get(self, obj_id: str) -> TypeVar('Base'):
+        """ Object with this ID or None, built on first access
+        """
+        obj = self.objs.get(obj_id)
+        if obj is None and obj_id in self.raw:
+            with self.lock_for(obj_id):
+                obj = self.objs.get(obj_id)
+                obj_json = self.raw.get(obj_id)
+                if obj is None and obj_json is not None:
+                    obj = self.factory(**obj_json)
+                    self.objs[obj_id] = obj
+                    del self.raw[obj_id]
+        return obj
+
+    def values(self) -> List[TypeVar('Base')]:
+        """ Snapshot of the objects, building any still raw
+        """
+        for obj_id in list(self.raw):
+            self.get(obj_id)
+        return list(self.objs.values())
+
+    def items(self) -> list:
+        """ Snapshot of the (id, object) pairs, records still raw are
+        returned as their dict
+        """
+        return list(self.raw.items()) + list(self.objs.items())
+
+    def __len__(self) -> int:
+        """ Number of objects
+        """
+        return len(self.objs) + len(self.raw)
+
+
+class Store():
+    """ The tables of every model class, by class name
+    """
+
+    def __init__(self):
+        """ Initialize an empty store
+        """
+        self._tables = {}
+        self._lock = threading.Lock()
+
+    def table(self, s_class: str,
+              index_attrs: Iterable[str] = ()) -> Table:
+        """ Table of s_class, created empty on first use
+        """
+        table = self._tables.get(s_class)
+        if table is None:
+            with self._lock:
+                table = self._tables.get(s_class)
+                if table is None:
+                    table = self._tables[s_class] = Table(index_attrs)
+        return table
+
+    def replace(self, s_class: str, table: Table):
+        """ Swap in a fully built table
+        """
+        self._tables[s_class] = table
+
+    def __contains__(self, s_class: str) -> bool:
+        """ True once s_class has a table
+        """
+        return s_class in self._tables
+
+
+DATA = Store()
+
+
+@atexit.register
+def _shutdown():
+    """ Flush pending group commits and let running compactions finish
+
+    Compaction locks are kept so no compaction starts on a thread that is
+    about to be killed at interpreter exit.
+    """
+    for committer in list(COMMITTERS.values()):
+        committer.drain()
+    for journal in list(JOURNALS.values()):
+        journal.compact_lock.acquire()
+
+
+class JsonFileStorage(Storage):
+    """ Every object in memory, persisted to .db_<Class>.json
+
+    DB_WRITE_MODE=journal appends each mutation to .db_<Class>.journal
+    instead of rewriting the snapshot, DB_GROUP_COMMIT_MS coalesces the
+    writes of that many milliseconds into one fsync.
+    """
+    in_memory = True
+
+    @staticmethod
+    def file_path(cls: type) -> str:
+        """ Snapshot file of cls
+        """
+        return ".db_{}.json".format(cls.__name__)
+
+    def table(self, cls: type) -> Table:
+        """ Table holding the objects of cls
+        """
+        return DATA.table(cls.__name__, cls._indexes)
+
+    def journal(self, cls: type) -> Journal:
+        """ Journal of cls
+        """
+        s_class = cls.__name__
+        if s_class not in JOURNALS:
+            JOURNALS[s_class] = Journal(".db_{}.journal".format(s_class))
+        return JOURNALS[s_class]
+
+    def generation(self, cls: type, stat: os.stat_result = None) -> tuple:
+        """ Generation of the snapshot file: (inode, mtime, size)
+
+        Every snapshot is a new file renamed into place, so the
+        generation changes whenever any process rewrites it.
+        """
+        if stat is None:
+            try:
+                stat = os.stat(self.file_path(cls))
+            except FileNotFoundError:
+                return None
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def _read_snapshot(self, cls: type) -> tuple:
+        """ (generation, {id: object JSON}) of the snapshot file
+        """
+        file_path = self.file_path(cls)
+        if not path.exists(file_path):
+            return None, {}
+        with open(file_path, 'r') as f:
+            return self.generation(cls, os.fstat(f.fileno())), json.load(f)
+
+    def load(self, cls: type):
+        """ Load all objects from file
+
+        The snapshot is read first, then any journal is replayed on top of
+        it and folded back into the snapshot. Nothing is re-read when the
+        snapshot generation is the one already loaded and there is no
+        journal to replay. With DB_LAZY_LOAD=1 records are kept as parsed
+        dicts and only turned into objects when first accessed.
+        """
+        s_class = cls.__name__
+        file_path = self.file_path(cls)
+        journal = self.journal(cls)
+        generation = self.generation(cls)
+        if s_class in DATA and generation is not None and \
+                GENERATIONS.get(s_class) == generation and \
+                not path.exists(journal.file_path) and \
+                not path.exists(journal.compacting_path):
+            return
+        with journal.compact_lock, journal.compact_file_lock.held(True):
+            journal.close()
+            generation, objs_json = self._read_snapshot(cls)
+            replayed = Journal.replay(journal.compacting_path, objs_json)
+            replayed += Journal.replay(journal.file_path, objs_json)
+        GENERATIONS[s_class] = generation
+
+        table = Table(cls._indexes, cls)
+        for obj_json in objs_json.values():
+            if LAZY_LOAD:
+                table.put_raw(obj_json)
+            else:
+                table.put(cls(**obj_json))
+        DATA.replace(s_class, table)
+        if replayed:
+            self.compact(cls)
+
+    def sync(self, cls: type, objs: Iterable = None,
+             loaded: bool = True):
+        """ Save all objects to file
+
+        The snapshot is written to a temporary file, fsynced and renamed
+        over .db_<Class>.json, readers see either the old or the new one.
+
+        objs: (id, object or raw dict) pairs to write, all objects of
+        the class by default
+        loaded: objs is what this process holds in memory, so the new
+        generation needs no reload
+
+        In journal mode, a sync of all objects flushes pending group
+        commits and folds the journal instead, as the memory of this
+        process may miss writes of others.
+        """
+        s_class = cls.__name__
+        if objs is None and WRITE_MODE == "journal":
+            if s_class in COMMITTERS:
+                COMMITTERS[s_class].drain()
+            self.journal(cls).sync()
+            self.compact(cls)
+            return
+        file_path = self.file_path(cls)
+        lock = SNAPSHOT_LOCKS.setdefault(s_class, threading.Lock())
+        with lock:
+            if objs is None:
+                objs = self.table(cls).items()
+            objs_json = {}
+            for obj_id, obj in objs:
+                objs_json[obj_id] = obj if type(obj) is dict \
+                    else obj.to_json(True)
+
+            fd, tmp_path = tempfile.mkstemp(prefix=file_path + ".",
+                                            suffix=".tmp", dir=".")
+            try:
+                os.chmod(tmp_path, file_mode(file_path))
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(objs_json, f)
+                    f.flush()
+                    os.fsync(f.fileno())
+                    generation = self.generation(cls, os.fstat(f.fileno()))
+                os.replace(tmp_path, file_path)
+            except BaseException:
+                if path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            if loaded:
+                GENERATIONS[s_class] = generation
+
+    def compact(self, cls: type):
+        """ Fold the journal into a fresh snapshot
+
+        The journal is moved aside under its locks so saves (of any
+        process) keep appending to a new one, then the snapshot file and
+        the moved log are merged on disk: the result includes the writes
+        of every process, not only the objects held here.
+        """
+        journal = self.journal(cls)
+        if not journal.compact_lock.acquire(blocking=False):
+            return
+        try:
+            with journal.compact_file_lock.held():
+                with journal.lock:
+                    journal.rotate()
+                _, objs_json = self._read_snapshot(cls)
+                if Journal.replay(journal.compacting_path, objs_json):
+                    self.sync(cls, objs_json.items(), loaded=False)
+                if path.exists(journal.compacting_path):
+                    os.remove(journal.compacting_path)
+        finally:
+            journal.compact_lock.release()
+
+    def _flush(self, cls: type, records: List[dict], sync: bool = False):
+        """ Persist records: append them to the journal (compacting in
+        the background once it holds COMPACT_EVERY entries) or rewrite
+        the snapshot
+        """
+        if WRITE_MODE != "journal":
+            self.sync(cls)
+            return
+        journal = self.journal(cls)
+        if journal.append(records, sync) >= COMPACT_EVERY and \
+                not journal.compact_lock.locked():
+            threading.Thread(target=self.compact, args=(cls,)).start()
+
+    def _committer(self, cls: type) -> GroupCommit:
+        """ Group committer of cls
+        """
+        s_class = cls.__name__
+        if s_class not in COMMITTERS:
+            COMMITTERS[s_class] = GroupCommit(
+                lambda records: self._flush(cls, records, sync=True),
+                GROUP_COMMIT_MS / 1000)
+        return COMMITTERS[s_class]
+
+    def _write(self, cls: type, record: dict) -> Future:
+        """ Start persisting one mutation, called under the ID's lock so
+        records reach the journal in mutation order
+
+        Returns the group commit Future when DB_GROUP_COMMIT_MS is set.
+        """
+        if GROUP_COMMIT_MS > 0:
+            return self._committer(cls).submit(record)
+        if WRITE_MODE == "journal":
+            self._flush(cls, [record])
+        return None
+
+    def _sync(self, cls: type, future: Future, wait: bool):
+        """ Finish persisting a mutation outside of the ID's lock
+        """
+        if future is not None:
+            if wait:
+                future.result()
+        elif WRITE_MODE != "journal":
+            self.sync(cls)
+
+    def save(self, obj: TypeVar('Base'), wait: bool = True):
+        """ Insert or replace obj
+        """
+        cls = obj.__class__
+        table = self.table(cls)
+        with table.lock_for(obj.id):
+            table.put(obj)
+            future = self._write(cls, {"id": obj.id,
+                                       "obj": obj.to_json(True)})
+        self._sync(cls, future, wait)
+
+    def remove(self, obj: TypeVar('Base'), wait: bool = True):
+        """ Delete obj
+        """
+        cls = obj.__class__
+        table = self.table(cls)
+        with table.lock_for(obj.id):
+            if table.pop(obj.id) is None:
+                return
+            future = self._write(cls, {"id": obj.id, "removed": True})
+        self._sync(cls, future, wait)
+
+    def get(self, cls: type, obj_id: str) -> TypeVar('Base'):
+        """ Object of cls with this ID or None
+        """
+        return self.table(cls).get(obj_id)
+
+    def ids_after(self, cls: type, after: str = None,
+                  count: int = PAGE_CHUNK) -> List[str]:
+        """ Up to count IDs of cls greater than after, in order
+        """
+        return self.table(cls).order.after(after, count)
+
+    def search(self, cls: type, attributes: dict = {}) \
+            -> List[TypeVar('Base')]:
+        """ Uses a secondary index when one of the attributes has one,
+        otherwise scans every object
+        """
+        table = self.table(cls)
+        candidates = None
+        for k, v in attributes.items():
+            if k in table.indexes:
+                try:
+                    ids = table.indexes[k].lookup(v)
+                except TypeError:
+                    continue
+                candidates = filter(None, map(table.get, ids))
+                break
+        if candidates is None:
+            candidates = table.values()
+        return [obj for obj in candidates if self.matches(obj, attributes)]
+
+    def count(self, cls: type) -> int:
+        """ Number of objects of cls
+        """
+        return len(self.table(cls))
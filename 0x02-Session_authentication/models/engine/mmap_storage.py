@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+""" Memory-mapped key-value storage: an append-only record file per class
+"""
+from typing import TypeVar, List
+from os import path
+from models.engine.storage import Index, SortedIds, Storage, PAGE_CHUNK, \
+    file_mode
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+
+HEADER = struct.Struct("<III")
+
+
+class KVFile():
+    """ .db_<Class>.kv: records of (id, indexed values, object JSON)
+
+    Each record is a header (id, index and object lengths) followed by the
+    three UTF-8 blobs, a record with an empty object removes the ID. Only
+    ID -> (offset, length) and the secondary indexes are kept in memory,
+    objects are read back through a memory map of the file.
+    """
+
+    def __init__(self, file_path: str, index_attrs: tuple):
+        """ Open file_path, scanning the record headers
+        """
+        self.file_path = file_path
+        self.index_attrs = index_attrs
+        self.lock = threading.Lock()
+        self.offsets = {}
+        self.indexes = {attr: Index(attr) for attr in index_attrs}
+        self.order = SortedIds(lambda: list(self.offsets))
+        self.live_bytes = 0
+        self.size = 0
+        self._map = None
+        self._file = open(file_path, 'ab+')
+        self._scan()
+
+    def _remap(self):
+        """ Map the whole file, caller holds the lock (or is __init__)
+        """
+        size = os.fstat(self._file.fileno()).st_size
+        self._map = mmap.mmap(self._file.fileno(), size,
+                              access=mmap.ACCESS_READ) if size else None
+
+    def _scan(self):
+        """ Build offsets and indexes, dropping a torn last record
+        """
+        self._remap()
+        m = self._map
+        size = len(m) if m is not None else 0
+        pos = 0
+        while pos + HEADER.size <= size:
+            id_len, idx_len, obj_len = HEADER.unpack_from(m, pos)
+            start = pos + HEADER.size
+            end = start + id_len + idx_len + obj_len
+            if end > size:
+                break
+            obj_id = m[start:start + id_len].decode()
+            if obj_len:
+                values = json.loads(m[start + id_len:end - obj_len])
+                self._put(obj_id, end - obj_len, obj_len, values)
+            else:
+                self._pop(obj_id)
+            pos = end
+        if pos != size:
+            self._file.truncate(pos)
+            self._remap()
+        self.size = pos
+
+    def _put(self, obj_id: str, offset: int, length: int, values: dict):
+        """ Point obj_id at a record
+        """
+        old = self.offsets.get(obj_id)
+        if old is not None:
+            self.live_bytes -= old[1]
+        if old is None:
+            self.order.add(obj_id)
+        self.offsets[obj_id] = (offset, length)
+        self.live_bytes += length
+        for attr, index in self.indexes.items():
+            index.put(obj_id, values.get(attr))
+
+    def _pop(self, obj_id: str) -> bool:
+        """ Forget obj_id
+        """
+        old = self.offsets.pop(obj_id, None)
+        if old is None:
+            return False
+        self.live_bytes -= old[1]
+        self.order.discard(obj_id)
+        for index in self.indexes.values():
+            index.discard(obj_id)
+        return True
+
+    def append(self, obj_id: str, values: dict = None, data: bytes = b"",
+               sync: bool = True):
+        """ Append a record, a removal when data is empty
+        """
+        key = obj_id.encode()
+        idx = json.dumps(values or {}).encode()
+        with self.lock:
+            self._file.write(HEADER.pack(len(key), len(idx), len(data)) +
+                             key + idx + data)
+            self._file.flush()
+            if sync:
+                os.fsync(self._file.fileno())
+            self.size += HEADER.size + len(key) + len(idx) + len(data)
+            if data:
+                self._put(obj_id, self.size - len(data), len(data), values)
+            else:
+                self._pop(obj_id)
+
+    def read(self, obj_id: str) -> bytes:
+        """ Object JSON of obj_id or None
+
+        The map is extended when the record was appended after it was
+        made.
+        """
+        loc = self.offsets.get(obj_id)
+        if loc is None:
+            return None
+        end = loc[0] + loc[1]
+        m = self._map
+        if m is None or end > len(m):
+            with self.lock:
+                self._remap()
+                m = self._map
+        return m[loc[0]:end]
+
+    def sync(self):
+        """ fsync the file
+        """
+        with self.lock:
+            os.fsync(self._file.fileno())
+
+    def garbage(self) -> int:
+        """ Bytes of the file no longer referenced
+        """
+        return self.size - self.live_bytes
+
+    def compact(self):
+        """ Rewrite the live records into a new file, renamed into place
+        """
+        with self.lock:
+            self._remap()
+            m = self._map
+            fd, tmp_path = tempfile.mkstemp(prefix=self.file_path + ".",
+                                            suffix=".tmp", dir=".")
+            try:
+                os.chmod(tmp_path, file_mode(self.file_path))
+                with os.fdopen(fd, 'wb') as f:
+                    for obj_id, (offset, length) in self.offsets.items():
+                        key = obj_id.encode()
+                        values = {attr: index.values.get(obj_id)
+                                  for attr, index in self.indexes.items()}
+                        idx = json.dumps(values).encode()
+                        f.write(HEADER.pack(len(key), len(idx), length) +
+                                key + idx + m[offset:offset + length])
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.file_path)
+            except BaseException:
+                if path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            self._file.close()
+            self._file = open(self.file_path, 'ab+')
+            self.offsets = {}
+            self.indexes = {a: Index(a) for a in self.index_attrs}
+            self.order.invalidate()
+            self.live_bytes = 0
+            self._scan()
+
+
+class MmapStorage(Storage):
+    """ Objects of each class in an append-only file read through mmap
+
+    Startup only scans record headers, objects are decoded when get or
+    search reaches them. The file is compacted on load once more than half
+    of it is dead records.
+    """
+
+    def __init__(self):
+        """ Initialize with no file open yet
+        """
+        self._files = {}
+        self._lock = threading.Lock()
+
+    def file(self, cls: type) -> KVFile:
+        """ Record file of cls, opened on first use, a new file gets the
+        objects of the json storage
+        """
+        kv = self._files.get(cls.__name__)
+        if kv is None:
+            with self._lock:
+                kv = self._files.get(cls.__name__)
+                if kv is None:
+                    file_path = ".db_{}.kv".format(cls.__name__)
+                    created = not path.exists(file_path)
+                    kv = KVFile(file_path, tuple(cls._indexes))
+                    self._files[cls.__name__] = kv
+                    if created:
+                        self.import_json(cls)
+        return kv
+
+    def load(self, cls: type):
+        """ Open the file of cls, compacting it when mostly garbage
+        """
+        kv = self.file(cls)
+        if kv.garbage() > max(kv.live_bytes, 1 << 20):
+            kv.compact()
+
+    def sync(self, cls: type):
+        """ fsync the file of cls, for saves made with wait=False
+        """
+        self.file(cls).sync()
+
+    def save(self, obj: TypeVar('Base'), wait: bool = True):
+        """ Append the new version of obj
+
+        wait: fsync before returning
+        """
+        kv = self.file(obj.__class__)
+        values = {attr: getattr(obj, attr, None) for attr in kv.index_attrs}
+        data = json.dumps(obj.to_json(True)).encode()
+        kv.append(obj.id, values, data, sync=wait)
+
+    def remove(self, obj: TypeVar('Base'), wait: bool = True):
+        """ Append a removal of obj
+        """
+        kv = self.file(obj.__class__)
+        if obj.id in kv.offsets:
+            kv.append(obj.id, sync=wait)
+
+    def get(self, cls: type, obj_id: str) -> TypeVar('Base'):
+        """ Object of cls with this ID or None
+        """
+        try:
+            data = self.file(cls).read(obj_id)
+        except TypeError:
+            return None
+        return cls(**json.loads(data)) if data is not None else None
+
+    def search(self, cls: type, attributes: dict = {}) \
+            -> List[TypeVar('Base')]:
+        """ Uses a secondary index when one of the attributes has one,
+        otherwise decodes every object
+        """
+        kv = self.file(cls)
+        ids = None
+        for k, v in attributes.items():
+            if k in kv.indexes:
+                try:
+                    ids = kv.indexes[k].lookup(v)
+                except TypeError:
+                    continue
+                break
+        if ids is None:
+            ids = list(kv.offsets)
+        objs = filter(None, (self.get(cls, obj_id) for obj_id in ids))
+        return [obj for obj in objs if self.matches(obj, attributes)]
+
+    def count(self, cls: type) -> int:
+        """ Number of objects of cls
+        """
+        return len(self.file(cls).offsets)
+
+    def ids_after(self, cls: type, after: str = None,
+                  count: int = PAGE_CHUNK) -> List[str]:
+        """ Up to count IDs of cls greater than after, in order
+        """
+        return self.file(cls).order.after(after, count)
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+""" SQLite storage: one table per class, nothing kept in memory
+"""
+from typing import Iterator, TypeVar, List
+from models.engine.storage import Storage, PAGE_CHUNK
+import json
+import os
+import sqlite3
+import threading
+
+SQL_TYPES = (str, int, float, bytes, type(None))
+
+
+class SQLiteStorage(Storage):
+    """ Objects stored as JSON rows in an SQLite database
+
+    Each class gets a table (id, data) plus one indexed column per
+    attribute listed in cls._indexes. Objects are decoded on access, so
+    startup does not depend on the number of rows.
+    """
+
+    def __init__(self, db_path: str = None):
+        """ Open (or create) the database at db_path
+        """
+        self.db_path = db_path or os.getenv("DB_SQLITE_PATH", ".db.sqlite3")
+        self._conn = sqlite3.connect(self.db_path, isolation_level=None,
+                                     check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._lock = threading.Lock()
+        self._tables = set()
+
+    def _execute(self, cls: type, sql: str, params: tuple = ()) -> list:
+        """ Run one statement on the table of cls, return its rows
+        """
+        if cls.__name__ not in self._tables:
+            self.load(cls)
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def load(self, cls: type):
+        """ Create the table and its indexes if needed, importing the
+        objects of the json storage into a new table
+        """
+        s_class = cls.__name__
+        columns = "".join(', "{}"'.format(attr) for attr in cls._indexes)
+        with self._lock:
+            created = not self._conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' "
+                "AND name = ?", (s_class,)).fetchall()
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS "{}" '
+                '(id TEXT PRIMARY KEY, data TEXT NOT NULL{})'
+                .format(s_class, columns))
+            for attr in cls._indexes:
+                self._conn.execute(
+                    'CREATE INDEX IF NOT EXISTS "{0}_{1}" ON "{0}" ("{1}")'
+                    .format(s_class, attr))
+        self._tables.add(s_class)
+        if created:
+            self.import_json(cls)
+
+    def sync(self, cls: type):
+        """ Every write is committed already, checkpoint the WAL
+        """
+        with self._lock:
+            self._conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+
+    def _decode(self, cls: type, data: str) -> TypeVar('Base'):
+        """ Object of cls from its stored JSON
+        """
+        return cls(**json.loads(data))
+
+    def save(self, obj: TypeVar('Base'), wait: bool = True):
+        """ Insert or replace obj
+        """
+        cls = obj.__class__
+        values = [obj.id, json.dumps(obj.to_json(True))]
+        for attr in cls._indexes:
+            value = getattr(obj, attr, None)
+            values.append(value if isinstance(value, SQL_TYPES) else None)
+        self._execute(cls, 'INSERT OR REPLACE INTO "{}" VALUES ({})'.format(
+            cls.__name__, ", ".join("?" * len(values))), tuple(values))
+
+    def remove(self, obj: TypeVar('Base'), wait: bool = True):
+        """ Delete obj
+        """
+        cls = obj.__class__
+        self._execute(cls, 'DELETE FROM "{}" WHERE id = ?'.format(
+            cls.__name__), (obj.id,))
+
+    def get(self, cls: type, obj_id: str) -> TypeVar('Base'):
+        """ Object of cls with this ID or None
+        """
+        if not isinstance(obj_id, str):
+            return None
+        rows = self._execute(cls, 'SELECT data FROM "{}" WHERE id = ?'
+                             .format(cls.__name__), (obj_id,))
+        return self._decode(cls, rows[0][0]) if rows else None
+
+    def search(self, cls: type, attributes: dict = {}) \
+            -> List[TypeVar('Base')]:
+        """ Filters in SQL on indexed columns and plain stored attributes
+        (declared fields, or names that are not class attributes such as
+        properties), then checks every attribute on the decoded objects
+        """
+        where = []
+        params = []
+        for k, v in attributes.items():
+            if not isinstance(v, SQL_TYPES):
+                continue
+            if k in cls._indexes:
+                where.append('"{}" IS ?'.format(k))
+                params.append(v)
+            elif k in cls._fields or not hasattr(cls, k):
+                where.append('json_extract(data, ?) IS ?')
+                params.extend(('$."{}"'.format(k), v))
+        sql = 'SELECT data FROM "{}"'.format(cls.__name__)
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        objs = [self._decode(cls, data)
+                for data, in self._execute(cls, sql, tuple(params))]
+        return [obj for obj in objs if self.matches(obj, attributes)]
+
+    def _rows_after(self, cls: type, column: str, after: str,
+                    count: int) -> list:
+        """ column of up to count rows with an ID greater than after
+        """
+        sql = 'SELECT {} FROM "{}"'.format(column, cls.__name__)
+        params = ()
+        if after is not None:
+            sql += " WHERE id > ?"
+            params = (after,)
+        return self._execute(cls, sql + " ORDER BY id LIMIT ?",
+                             params + (count,))
+
+    def ids_after(self, cls: type, after: str = None,
+                  count: int = PAGE_CHUNK) -> List[str]:
+        """ Up to count IDs of cls greater than after, in order
+        """
+        return [obj_id for obj_id, in
+                self._rows_after(cls, "id", after, count)]
+
+    def page(self, cls: type, after: str = None, limit: int = None) \
+            -> Iterator[TypeVar('Base')]:
+        """ Objects of cls in ID order after the ID after, read by
+        keyset queries of PAGE_CHUNK rows on the primary key
+        """
+        while limit is None or limit > 0:
+            count = PAGE_CHUNK if limit is None else min(limit, PAGE_CHUNK)
+            rows = self._rows_after(cls, "id, data", after, count)
+            for _, data in rows:
+                yield self._decode(cls, data)
+            if len(rows) < count:
+                return
+            after = rows[-1][0]
+            if limit is not None:
+                limit -= len(rows)
+
+    def count(self, cls: type) -> int:
+        """ Number of objects of cls
+        """
+        return self._execute(cls, 'SELECT COUNT(*) FROM "{}"'.format(
+            cls.__name__))[0][0]
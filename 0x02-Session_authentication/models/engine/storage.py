@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+""" Storage backend interface
+"""
+from bisect import bisect_left, bisect_right
+from os import path
+from typing import Callable, Iterable, Iterator, TypeVar, List
+import json
+import os
+import threading
+
+PAGE_CHUNK = 1000
+
+
+def file_mode(file_path: str) -> int:
+    """ Permissions for a new version of file_path: those of the current
+    file, or what open() would give a new one (0o666 less the umask)
+    """
+    try:
+        return os.stat(file_path).st_mode & 0o7777
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+class Index():
+    """ Secondary index: attribute value -> ids of the objects holding it
+
+    Kept up to date by the storage on save, remove and load.
+    """
+
+    def __init__(self, attr: str):
+        """ Initialize an empty index on attr
+        """
+        self.attr = attr
+        self.ids = {}
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def add(self, obj: TypeVar('Base')):
+        """ Index obj under its current attribute value
+        """
+        self.put(obj.id, getattr(obj, self.attr, None))
+
+    def put(self, obj_id: str, value):
+        """ Index obj_id under value
+        """
+        with self._lock:
+            self._discard(obj_id)
+            try:
+                self.ids.setdefault(value, {})[obj_id] = None
+            except TypeError:
+                return
+            self.values[obj_id] = value
+
+    def discard(self, obj_id: str):
+        """ Forget the object with this ID
+        """
+        with self._lock:
+            self._discard(obj_id)
+
+    def _discard(self, obj_id: str):
+        """ discard, caller holds the lock
+        """
+        if obj_id not in self.values:
+            return
+        value = self.values.pop(obj_id)
+        ids = self.ids[value]
+        del ids[obj_id]
+        if not ids:
+            del self.ids[value]
+
+    def lookup(self, value) -> List[str]:
+        """ IDs of the objects indexed under value
+        """
+        return list(self.ids.get(value, ()))
+
+
+class SortedIds():
+    """ IDs of one class in order, for paging
+
+    Kept up to date by add and discard once built; invalidate() drops it
+    (e.g. after a bulk load) and the next after() sorts `source()` again.
+    """
+
+    def __init__(self, source: Callable[[], Iterable[str]]):
+        """ Initialize, ids are sorted on first use
+        """
+        self.source = source
+        self._ids = None
+        self._lock = threading.Lock()
+
+    def add(self, obj_id: str):
+        """ Insert obj_id if missing
+        """
+        with self._lock:
+            if self._ids is None:
+                return
+            i = bisect_left(self._ids, obj_id)
+            if i == len(self._ids) or self._ids[i] != obj_id:
+                self._ids.insert(i, obj_id)
+
+    def discard(self, obj_id: str):
+        """ Remove obj_id if present
+        """
+        with self._lock:
+            if self._ids is None:
+                return
+            i = bisect_left(self._ids, obj_id)
+            if i < len(self._ids) and self._ids[i] == obj_id:
+                del self._ids[i]
+
+    def invalidate(self):
+        """ Forget the order, rebuilt on next use
+        """
+        with self._lock:
+            self._ids = None
+
+    def after(self, after: str = None, count: int = PAGE_CHUNK) \
+            -> List[str]:
+        """ Up to count IDs greater than after (from the first when None)
+        """
+        with self._lock:
+            if self._ids is None:
+                self._ids = sorted(self.source())
+            i = 0 if after is None else bisect_right(self._ids, after)
+            return self._ids[i:i + count]
+
+
+class Storage():
+    """ Where Base keeps its objects
+
+    Every method takes the model class (or an instance of it), backends
+    key their data by cls.__name__ and may index the attributes listed in
+    cls._indexes. in_memory is True for backends holding every record
+    in memory.
+    """
+    in_memory = False
+
+    def load(self, cls: type):
+        """ (Re)load the objects of cls from disk
+        """
+        raise NotImplementedError
+
+    def sync(self, cls: type):
+        """ Make every object of cls durable now
+        """
+        raise NotImplementedError
+
+    def save(self, obj: TypeVar('Base'), wait: bool = True):
+        """ Insert or replace obj
+
+        wait: block until the write is durable when the backend defers
+        writes
+        """
+        raise NotImplementedError
+
+    def remove(self, obj: TypeVar('Base'), wait: bool = True):
+        """ Delete obj
+        """
+        raise NotImplementedError
+
+    def get(self, cls: type, obj_id: str) -> TypeVar('Base'):
+        """ Object of cls with this ID or None
+        """
+        raise NotImplementedError
+
+    def search(self, cls: type, attributes: dict = {}) \
+            -> List[TypeVar('Base')]:
+        """ Objects of cls whose attributes equal every item of attributes
+        """
+        raise NotImplementedError
+
+    def count(self, cls: type) -> int:
+        """ Number of objects of cls
+        """
+        raise NotImplementedError
+
+    def ids_after(self, cls: type, after: str = None,
+                  count: int = PAGE_CHUNK) -> List[str]:
+        """ Up to count IDs of cls greater than after, in order
+        """
+        raise NotImplementedError
+
+    def page(self, cls: type, after: str = None, limit: int = None) \
+            -> Iterator[TypeVar('Base')]:
+        """ Objects of cls in ID order, starting after the ID after, at
+        most limit of them
+
+        A generator: IDs are fetched PAGE_CHUNK at a time from the cursor
+        position and objects built one by one as they are consumed.
+        """
+        while limit is None or limit > 0:
+            count = PAGE_CHUNK if limit is None else min(limit, PAGE_CHUNK)
+            ids = self.ids_after(cls, after, count)
+            if not ids:
+                return
+            for obj_id in ids:
+                obj = self.get(cls, obj_id)
+                if obj is None:
+                    continue
+                yield obj
+                if limit is not None:
+                    limit -= 1
+            after = ids[-1]
+
+    def import_json(self, cls: type) -> int:
+        """ Save every object of the json storage files of cls
+        (.db_<Class>.json and its journal) here, return how many
+
+        Backends call it when they create the store of cls, so switching
+        MODEL_STORAGE keeps the existing objects.
+        """
+        from models.engine.json_storage import Journal
+        file_path = ".db_{}.json".format(cls.__name__)
+        objs_json = {}
+        if path.exists(file_path):
+            with open(file_path, 'r') as f:
+                objs_json = json.load(f)
+        for suffix in (".journal.compacting", ".journal"):
+            Journal.replay(".db_{}{}".format(cls.__name__, suffix),
+                           objs_json)
+        for obj_json in objs_json.values():
+            self.save(cls(**obj_json), wait=False)
+        if objs_json:
+            self.sync(cls)
+        return len(objs_json)
+
+    @staticmethod
+    def matches(obj: TypeVar('Base'), attributes: dict) -> bool:
+        """ True when obj has every attribute value of attributes
+        """
+        for k, v in attributes.items():
+            if (getattr(obj, k) != v):
+                return False
+        return True
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+""" Columnar in-memory table of the live sessions
+"""
+from array import array
+from datetime import datetime
+from itertools import compress
+from typing import Iterable, List
+import calendar
+import sys
+import threading
+import time
+
+
+def to_epoch(value: datetime) -> int:
+    """ Seconds since the epoch of a naive UTC datetime
+    """
+    return calendar.timegm(value.utctimetuple())
+
+
+class SessionTable():
+    """ (id, user_id, session_id, created_at, updated_at) rows in columns
+
+    Strings live in lists (user IDs are interned, many sessions share
+    one), timestamps are epoch seconds in array('q') and session_id maps
+    to its row. Removing a row moves the last row into its place, so
+    the columns stay dense and expiry is a single pass over created_at.
+    """
+
+    def __init__(self):
+        """ Initialize an empty table
+        """
+        self.ids = []
+        self.user_ids = []
+        self.session_ids = []
+        self.created_at = array('q')
+        self.updated_at = array('q')
+        self.rows = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """ Number of sessions
+        """
+        return len(self.session_ids)
+
+    def add(self, obj_id: str, user_id: str, session_id: str,
+            created_at: int, updated_at: int = None):
+        """ Insert or replace the row of session_id
+        """
+        with self._lock:
+            row = self.rows.get(session_id)
+            if row is None:
+                row = len(self.session_ids)
+                self.ids.append(obj_id)
+                self.user_ids.append(sys.intern(user_id))
+                self.session_ids.append(session_id)
+                self.created_at.append(created_at)
+                self.updated_at.append(updated_at or created_at)
+                self.rows[session_id] = row
+                return
+            self.ids[row] = obj_id
+            self.user_ids[row] = sys.intern(user_id)
+            self.created_at[row] = created_at
+            self.updated_at[row] = updated_at or created_at
+
+    def add_objects(self, user_sessions: Iterable):
+        """ Insert UserSession objects
+        """
+        for s in user_sessions:
+            if s.session_id and s.user_id:
+                self.add(s.id, s.user_id, s.session_id,
+                         to_epoch(s.created_at), to_epoch(s.updated_at))
+
+    def row(self, session_id: str) -> int:
+        """ Row of session_id or None
+        """
+        try:
+            return self.rows.get(session_id)
+        except TypeError:
+            return None
+
+    def lookup(self, session_id: str) -> tuple:
+        """ (user_id, created_at) of session_id or None
+        """
+        with self._lock:
+            row = self.row(session_id)
+            if row is None:
+                return None
+            return self.user_ids[row], self.created_at[row]
+
+    def remove(self, session_id: str) -> str:
+        """ Delete the row of session_id, return its UserSession ID
+        """
+        with self._lock:
+            row = self.rows.pop(session_id, None)
+            if row is None:
+                return None
+            obj_id = self.ids[row]
+            last = len(self.session_ids) - 1
+            if row != last:
+                self.ids[row] = self.ids[last]
+                self.user_ids[row] = self.user_ids[last]
+                self.session_ids[row] = self.session_ids[last]
+                self.created_at[row] = self.created_at[last]
+                self.updated_at[row] = self.updated_at[last]
+                self.rows[self.session_ids[row]] = row
+            del self.ids[last], self.user_ids[last], self.session_ids[last]
+            del self.created_at[last], self.updated_at[last]
+            return obj_id
+
+    def expired(self, duration: int, now: int = None) -> List[str]:
+        """ Session IDs created more than duration seconds before now
+        """
+        cutoff = (now if now is not None else int(time.time())) - duration
+        with self._lock:
+            return list(compress(self.session_ids,
+                                 map(cutoff.__gt__, self.created_at)))
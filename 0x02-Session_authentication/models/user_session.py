@@ -6,6 +6,9 @@ from models.base import Base
 class UserSession(Base):
     """UserSession custom."""
 
+    __slots__ = ('user_id', 'session_id')
+    _indexes = ('session_id',)
+
     def __init__(self, *args: list, **kwargs: dict):
         """Initialize."""
         super().__init__(*args, **kwargs)
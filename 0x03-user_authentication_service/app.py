@@ -2,6 +2,7 @@
 """Main app."""
 from flask import Flask, abort, jsonify, request, redirect, url_for
 from auth import Auth
+from verify_executor import Overloaded
 
 app = Flask(__name__)
 app.url_map.strict_slashes = False
@@ -9,6 +10,13 @@ app.config["JSONIFY_PRETTYPRINT_REGULAR"] = True
 AUTH = Auth()
 
 
+@app.errorhandler(Overloaded)
+def overloaded(error) -> str:
+    """Password hashing queue full."""
+    return jsonify({"message": "service unavailable"}), 503, \
+        {"Retry-After": "1"}
+
+
 @app.route("/")
 def home() -> str:
     """Hello WOrld."""
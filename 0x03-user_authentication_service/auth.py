@@ -5,6 +5,7 @@ from uuid import uuid4
 from sqlalchemy.orm.exc import NoResultFound
 from db import DB
 from user import User
+from verify_executor import verify_executor
 
 
 class Auth:
@@ -32,7 +33,8 @@ class Auth:
             user = db.find_user_by(email=email)
         except NoResultFound:
             return False
-        if not bcrypt.checkpw(password.encode('utf-8'), user.hashed_password):
+        if not verify_executor().run(bcrypt.checkpw, password.encode('utf-8'),
+                                     user.hashed_password):
             return False
         return True
 
@@ -86,8 +88,9 @@ class Auth:
 
 
 def _hash_password(password: str) -> bytes:
-    """Hash given pass."""
-    return bcrypt.hashpw(password.encode(), bcrypt.gensalt())
+    """Hash given pass on the verify executor."""
+    return verify_executor().run(bcrypt.hashpw, password.encode(),
+                                 bcrypt.gensalt())
 
 
 def _generate_uuid() -> str:
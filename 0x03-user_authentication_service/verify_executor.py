@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""Bounded executor for password hashing."""
+from concurrent.futures import Future, ThreadPoolExecutor
+import os
+import threading
+import time
+
+
+class Overloaded(RuntimeError):
+    """Raised instead of queueing when the verify executor is full."""
+
+
+class VerifyExecutor():
+    """Thread pool for password hashing with a bounded queue.
+
+    At most workers hashes run at once and at most max_queue more wait,
+    submit raises Overloaded right away beyond that. stats() reports the
+    time jobs spent queued. workers <= 0 runs jobs inline.
+    """
+
+    def __init__(self, workers: int, max_queue: int):
+        """Initialize the pool."""
+        self.workers = workers
+        self.max_queue = max_queue
+        self._pool = ThreadPoolExecutor(workers, "password") \
+            if workers > 0 else None
+        self._slots = threading.BoundedSemaphore(max(workers, 0) + max_queue)
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.rejected = 0
+        self.started = 0
+        self.completed = 0
+        self.queue_time = 0.0
+        self.max_queue_time = 0.0
+
+    def _started(self, queued: float):
+        """Account for a job starting after queued seconds."""
+        with self._lock:
+            self.started += 1
+            self.queue_time += queued
+            if queued > self.max_queue_time:
+                self.max_queue_time = queued
+
+    def submit(self, fn, *args) -> Future:
+        """Run fn(*args) on the pool, raise Overloaded when it is full."""
+        if self._pool is None:
+            future = Future()
+            future.set_result(fn(*args))
+            return future
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise Overloaded("password verification queue is full")
+        with self._lock:
+            self.submitted += 1
+        enqueued = time.perf_counter()
+
+        def job():
+            """fn(*args), releasing the slot once done."""
+            self._started(time.perf_counter() - enqueued)
+            try:
+                return fn(*args)
+            finally:
+                with self._lock:
+                    self.completed += 1
+                self._slots.release()
+        try:
+            return self._pool.submit(job)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def run(self, fn, *args):
+        """submit(fn, *args) and wait for the result."""
+        return self.submit(fn, *args).result()
+
+    def stats(self) -> dict:
+        """Counters and queue times (ms) since startup."""
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "submitted": self.submitted,
+                "rejected": self.rejected,
+                "started": self.started,
+                "completed": self.completed,
+                "queue_time_avg_ms": self.queue_time * 1000 /
+                self.started if self.started else 0.0,
+                "queue_time_max_ms": self.max_queue_time * 1000,
+            }
+
+
+_verify_executor = None
+_verify_executor_lock = threading.Lock()
+
+
+def verify_executor() -> VerifyExecutor:
+    """Shared executor, sized by PASSWORD_WORKERS and PASSWORD_QUEUE."""
+    global _verify_executor
+    if _verify_executor is None:
+        with _verify_executor_lock:
+            if _verify_executor is None:
+                _verify_executor = VerifyExecutor(
+                    int(os.getenv("PASSWORD_WORKERS", os.cpu_count() or 1)),
+                    int(os.getenv("PASSWORD_QUEUE", 64)))
+    return _verify_executor